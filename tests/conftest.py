@@ -0,0 +1,105 @@
+"""
+x9k3 tests
+
+conftest.py
+
+home of the shared test fixtures.
+"""
+
+import struct
+import pytest
+
+PACKET_SIZE = 188
+PMT_PID = 0x1000
+VIDEO_PID = 0x100
+
+
+def _crc32(data):
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc ^= byte << 24
+        for _ in range(8):
+            crc = (crc << 1) ^ 0x04C11DB7 if crc & 0x80000000 else crc << 1
+            crc &= 0xFFFFFFFF
+    return crc
+
+
+def _section(table_id, ext, body):
+    head = bytes([table_id]) + struct.pack(">H", 0xB000 | (len(body) + 9))
+    head += struct.pack(">H", ext) + b"\xc1\x00\x00"
+    section = head + body
+    return section + struct.pack(">I", _crc32(section))
+
+
+def _packet(pid, payload, pusi=False, adapt=b"", counter=0):
+    flags = 0x40 if pusi else 0
+    head = bytes([0x47, flags | pid >> 8, pid & 0xFF])
+    stuffing = PACKET_SIZE - 4 - len(payload)
+    if adapt or stuffing:
+        if not adapt:
+            adapt = b"\x00"
+        adapt += b"\xff" * (stuffing - len(adapt) - 1)
+        return head + bytes([0x30 | counter]) + bytes([len(adapt)]) + adapt + payload
+    return head + bytes([0x10 | counter]) + payload
+
+
+def _psi(pid, section):
+    return _packet(pid, b"\x00" + section, pusi=True)
+
+
+def _pts_bytes(pts):
+    return bytes(
+        [
+            0x21 | (pts >> 29) & 0x0E,
+            (pts >> 22) & 0xFF,
+            0x01 | (pts >> 14) & 0xFE,
+            (pts >> 7) & 0xFF,
+            0x01 | (pts << 1) & 0xFE,
+        ]
+    )
+
+
+def mk_ts(path, seconds=10, fps=30, gop=15, start=10.0):
+    """
+    mk_ts writes an mpegts file to path, one video
+    stream with one packet per frame, a key frame
+    every gop frames, and the PAT and PMT before
+    each key frame.
+    """
+    pat = _section(0, 1, struct.pack(">HH", 1, 0xE000 | PMT_PID))
+    pmt = _section(
+        2,
+        1,
+        struct.pack(">HH", 0xE000 | VIDEO_PID, 0xF000)
+        + bytes([0x1B])
+        + struct.pack(">HH", 0xE000 | VIDEO_PID, 0xF000),
+    )
+    ticks = 90000 // fps
+    first = int(start * 90000)
+    with open(path, "wb") as tsfile:
+        for frame in range(int(seconds * fps)):
+            pts = first + frame * ticks
+            key = frame % gop == 0
+            counter = frame & 0x0F
+            if key:
+                tsfile.write(_psi(0, pat) + _psi(PMT_PID, pmt))
+            pes = b"\x00\x00\x01\xe0\x00\x00\x80\x80\x05" + _pts_bytes(pts)
+            adapt = b""
+            if key:
+                pcr = pts - 9000
+                base = struct.pack(">IH", pcr >> 1, ((pcr & 1) << 15) | 0x7E00)
+                adapt = b"\x50" + base
+                pes += b"\x00\x00\x01\x65"
+            else:
+                pes += b"\x00\x00\x01\x41"
+            pes += bytes(100 - len(pes))
+            tsfile.write(_packet(VIDEO_PID, pes, True, adapt, counter))
+    return path
+
+
+@pytest.fixture
+def tsfile(tmp_path):
+    """
+    tsfile is a 10 second mpegts file, pts 10 to 20.
+    """
+    return str(mk_ts(tmp_path / "video.ts"))
@@ -0,0 +1,63 @@
+"""
+x9k3 tests
+
+test_checkpoint.py
+
+tests for continuing an index.m3u8 from its checkpoint.
+"""
+
+import json
+from x9k3 import X9K3, Config
+from x9k3.checkpoint import Checkpoint
+
+
+def _decode(tsfile, output_dir, **kwargs):
+    config = Config(input=tsfile, output_dir=output_dir, no_throttle=True, **kwargs)
+    x9 = X9K3(config=config)
+    x9.decode()
+    return x9
+
+
+def _segments(m3u8):
+    with open(m3u8, "r", encoding="utf8") as index:
+        return [line.strip() for line in index if line.startswith("seg")]
+
+
+def test_checkpoint_saved(tsfile, tmp_path):
+    output_dir = str(tmp_path / "out")
+    x9 = _decode(tsfile, output_dir)
+    state = Checkpoint(x9.m3u8uri()).load()
+    assert state["segnum"] == x9.segnum == 5
+    assert [a_pane[0] for a_pane in state["panes"]] == _segments(x9.m3u8uri())
+
+
+def test_continue_from_checkpoint(tsfile, tmp_path):
+    output_dir = str(tmp_path / "out")
+    _decode(tsfile, output_dir)
+    x9 = _decode(tsfile, output_dir, continue_m3u8=True)
+    segs = _segments(x9.m3u8uri())
+    assert segs == [f"seg{num}.ts" for num in range(10)]
+    with open(x9.m3u8uri(), "r", encoding="utf8") as index:
+        text = index.read()
+    assert text.count("#EXT-X-ENDLIST") == 1
+    assert "#EXT-X-DISCONTINUITY\nseg4.ts" in text
+    assert Checkpoint(x9.m3u8uri()).load()["segnum"] == 10
+
+
+def test_stale_checkpoint_ignored(tsfile, tmp_path, monkeypatch):
+    # M3uFu touches sidecar.txt in the working directory
+    monkeypatch.chdir(tmp_path)
+    output_dir = str(tmp_path / "out")
+    x9 = _decode(tsfile, output_dir)
+    checkpoint = Checkpoint(x9.m3u8uri())
+    with open(checkpoint.path(), "r", encoding="utf8") as state_file:
+        state = json.load(state_file)
+    state["segnum"] = 99
+    with open(checkpoint.path(), "w", encoding="utf8") as state_file:
+        json.dump(state, state_file)
+    with open(x9.m3u8uri(), "a", encoding="utf8") as index:
+        index.write("\n")
+    assert checkpoint.load() is None
+    # the m3u8 changed, so it is read instead of the checkpoint
+    x9 = _decode(tsfile, output_dir, continue_m3u8=True)
+    assert _segments(x9.m3u8uri())[5] == "seg5.ts"
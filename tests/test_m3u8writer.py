@@ -0,0 +1,111 @@
+"""
+x9k3 tests
+
+test_m3u8writer.py
+
+tests for M3u8Writer appends and rewrites.
+"""
+
+from x9k3 import M3u8Writer, Pane, Publisher, SlidingWindow
+
+HEADER = "#EXTM3U\n#EXT-X-VERSION:4\n#EXT-X-TARGETDURATION:2\n"
+
+
+class _Counting(Publisher):
+    """
+    _Counting counts m3u8 rewrites and appends.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.rewrites = 0
+        self.appends = 0
+
+    def publish_m3u8(self, path, text):
+        self.rewrites += 1
+        super().publish_m3u8(path, text)
+
+    def append_m3u8(self, path, text):
+        self.appends += 1
+        super().append_m3u8(path, text)
+
+
+def _pane(num):
+    a_pane = Pane(f"seg{num}.ts", f"out/seg{num}.ts", num)
+    a_pane.add_tag("#EXTINF", "2.000000,")
+    return a_pane
+
+
+def _rewritten(path, header, window, tail=""):
+    """
+    _rewritten returns the bytes a full rewrite makes.
+    """
+    M3u8Writer(Publisher(atomic=True)).write(path, header, window, tail)
+    with open(path, "rb") as m3u8:
+        return m3u8.read()
+
+
+def _read(path):
+    with open(path, "rb") as m3u8:
+        return m3u8.read()
+
+
+def test_appends_match_rewrite(tmp_path):
+    m3u8 = str(tmp_path / "index.m3u8")
+    full = str(tmp_path / "full.m3u8")
+    publisher = _Counting()
+    writer = M3u8Writer(publisher)
+    window = SlidingWindow()
+    for num in range(6):
+        window.slide_panes(_pane(num))
+        writer.write(m3u8, HEADER, window)
+        assert _read(m3u8) == _rewritten(full, HEADER, window)
+    assert publisher.rewrites == 1
+    assert publisher.appends == 5
+
+
+def test_sliding_window_rewrites(tmp_path):
+    m3u8 = str(tmp_path / "index.m3u8")
+    full = str(tmp_path / "full.m3u8")
+    publisher = _Counting()
+    writer = M3u8Writer(publisher)
+    window = SlidingWindow(size=3)
+    for num in range(6):
+        window.slide_panes(_pane(num))
+        header = f"{HEADER}#EXT-X-MEDIA-SEQUENCE:{window.panes[0].num}\n"
+        writer.write(m3u8, header, window)
+        assert _read(m3u8) == _rewritten(full, header, window)
+    # once the window is full, every pane pops one off the front
+    assert publisher.rewrites == 4
+
+
+def test_changed_pane_rewrites(tmp_path):
+    m3u8 = str(tmp_path / "index.m3u8")
+    full = str(tmp_path / "full.m3u8")
+    publisher = _Counting()
+    writer = M3u8Writer(publisher)
+    window = SlidingWindow()
+    for num in range(3):
+        window.slide_panes(_pane(num))
+        writer.write(m3u8, HEADER, window)
+    window.panes[-1].add_tag("#EXT-X-DISCONTINUITY", None)
+    writer.write(m3u8, HEADER, window)
+    assert _read(m3u8) == _rewritten(full, HEADER, window)
+    window.slide_panes(_pane(3))
+    writer.write(m3u8, HEADER, window)
+    assert _read(m3u8) == _rewritten(full, HEADER, window)
+
+
+def test_tail_and_endlist(tmp_path):
+    m3u8 = str(tmp_path / "index.m3u8")
+    full = str(tmp_path / "full.m3u8")
+    writer = M3u8Writer(Publisher())
+    window = SlidingWindow()
+    tail = '#EXT-X-PRELOAD-HINT:TYPE=PART,URI="seg1.0.ts"\n'
+    window.slide_panes(_pane(0))
+    writer.write(m3u8, HEADER, window)
+    window.slide_panes(_pane(1))
+    writer.write(m3u8, HEADER, window, tail)
+    assert _read(m3u8) == _rewritten(full, HEADER, window, tail)
+    writer.endlist(m3u8)
+    assert _read(m3u8) == _rewritten(full, HEADER, window, "#EXT-X-ENDLIST")
@@ -0,0 +1,41 @@
+"""
+x9k3 tests
+
+test_parallel.py
+
+tests for segmenting a vod file in parallel chunks.
+"""
+
+from x9k3 import Config, decode_parallel
+from x9k3.parallel import split_points
+from x9k3.x9k3 import run
+from conftest import mk_ts
+
+
+def _extinfs(m3u8):
+    with open(m3u8, "r", encoding="utf8") as index:
+        return [float(line[8:].rstrip(",\n")) for line in index if "EXTINF" in line]
+
+
+def test_split_points(tmp_path):
+    tsfile = str(mk_ts(tmp_path / "video.ts", seconds=20))
+    head, points = split_points(tsfile, 4)
+    assert len(head) == 188 * 2
+    assert len(points) == 3
+    for offset, pts in points:
+        assert not offset % 188
+        # key frames are every half second
+        assert not (pts * 2) % 1
+
+
+def test_parallel_matches_sequential(tmp_path):
+    tsfile = str(mk_ts(tmp_path / "video.ts", seconds=20))
+    one = Config(input=tsfile, output_dir=str(tmp_path / "one"), no_throttle=True)
+    run(one)
+    many = one.replace(output_dir=str(tmp_path / "many"), parallel=3)
+    assert decode_parallel(many)
+    seq = _extinfs(tmp_path / "one" / "index.m3u8")
+    par = _extinfs(tmp_path / "many" / "index.m3u8")
+    assert round(sum(par), 6) == round(sum(seq), 6)
+    assert max(par) <= max(seq)
+    assert not list((tmp_path / "many").glob(".x9k3_entry*"))
@@ -0,0 +1,62 @@
+"""
+x9k3 tests
+
+test_scheduler.py
+
+tests for CueScheduler ordering across the pts rollover.
+"""
+
+from x9k3 import CueScheduler
+from x9k3.scheduler import ROLLOVER
+
+
+def test_pops_in_pts_order():
+    sched = CueScheduler()
+    for pts in (30.0, 10.0, 20.0):
+        sched.add(pts, f"cue{pts}")
+    assert sched.peek() == (10.0, "cue10.0")
+    assert sched.pop_due(0.0, 25.0) == (10.0, "cue10.0")
+    assert sched.pop_due(0.0, 25.0) == (20.0, "cue20.0")
+    assert sched.pop_due(0.0, 25.0) is None
+    assert len(sched) == 1
+
+
+def test_add_twice():
+    sched = CueScheduler()
+    assert sched.add(10.0, "cue")
+    assert not sched.add(10.0, "cue")
+    assert len(sched) == 1
+
+
+def test_past_cues_are_dropped():
+    sched = CueScheduler()
+    sched.add(5.0, "late")
+    sched.add(12.0, "cue")
+    assert sched.pop_due(10.0, 12.0) == (12.0, "cue")
+    assert not sched
+    assert not sched.pending
+
+
+def test_rollover_order():
+    sched = CueScheduler()
+    sched.pop_due(ROLLOVER - 10.0, ROLLOVER - 10.0)
+    # scheduled after the rollover, with the smaller pts
+    sched.add(2.0, "after")
+    sched.add(ROLLOVER - 5.0, "before")
+    assert sched.peek() == (ROLLOVER - 5.0, "before")
+    assert sched.pop_due(ROLLOVER - 8.0, ROLLOVER - 1.0) == (ROLLOVER - 5.0, "before")
+    # not due until the pts has rolled over to 2.0
+    assert sched.pop_due(ROLLOVER - 1.0, ROLLOVER - 0.5) is None
+    assert sched.pop_due(ROLLOVER - 0.5, 1.0) is None
+    assert sched.pop_due(1.0, 3.0) == (2.0, "after")
+
+
+def test_added_after_rollover():
+    sched = CueScheduler()
+    sched.pop_due(ROLLOVER - 2.0, ROLLOVER - 1.0)
+    sched.pop_due(ROLLOVER - 1.0, 0.5)
+    # pts before the rollover are in the past now
+    sched.add(ROLLOVER - 1.5, "old")
+    sched.add(1.0, "new")
+    assert sched.pop_due(0.5, 1.5) == (1.0, "new")
+    assert not sched
@@ -0,0 +1,101 @@
+"""
+x9k3 tests
+
+test_server.py
+
+tests for OriginServer LL-HLS blocking playlist reload.
+"""
+
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from x9k3 import OriginServer
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """
+    origin serves tmp_path, with an index.m3u8,
+    and holds requests for up to a second.
+    """
+    (tmp_path / "index.m3u8").write_text("#EXTM3U\n")
+    server = OriginServer(str(tmp_path), 0, hold=1.0)
+    server.start()
+    server.update(1)
+    yield server
+    server.stop()
+
+
+def _get(origin, path):
+    """
+    _get returns the status code for path.
+    """
+    url = f"http://127.0.0.1:{origin.port}{path}"
+    try:
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            return resp.status
+    except urllib.error.HTTPError as err:
+        return err.code
+
+
+def _held(origin, path):
+    """
+    _held starts a request for path on a thread,
+    returns the thread and a list for its status.
+    """
+    found = []
+    thread = threading.Thread(target=lambda: found.append(_get(origin, path)))
+    thread.start()
+    time.sleep(0.2)
+    return thread, found
+
+
+def test_no_query(origin):
+    assert _get(origin, "/index.m3u8") == 200
+
+
+def test_bad_queries(origin):
+    assert _get(origin, "/index.m3u8?_HLS_part=0") == 400
+    assert _get(origin, "/index.m3u8?_HLS_msn=x") == 400
+    assert _get(origin, "/index.m3u8?_HLS_msn=4") == 400
+
+
+def test_msn_done(origin):
+    assert _get(origin, "/index.m3u8?_HLS_msn=0") == 200
+
+
+def test_msn_held(origin):
+    thread, found = _held(origin, "/index.m3u8?_HLS_msn=1")
+    assert not found
+    origin.update(2)
+    thread.join()
+    assert found == [200]
+
+
+def test_part_held(origin):
+    thread, found = _held(origin, "/index.m3u8?_HLS_msn=1&_HLS_part=1")
+    origin.update(1, 1)
+    time.sleep(0.2)
+    assert not found
+    origin.update(1, 2)
+    thread.join()
+    assert found == [200]
+
+
+def test_hold_times_out(origin):
+    assert _get(origin, "/index.m3u8?_HLS_msn=2") == 503
+
+
+def test_preload_hint_part_held(origin, tmp_path):
+    thread, found = _held(origin, "/seg1.0.ts")
+    assert not found
+    (tmp_path / "seg1.0.ts").write_bytes(b"\x47" * 188)
+    origin.update(1, 1)
+    thread.join()
+    assert found == [200]
+
+
+def test_missing_file(origin):
+    assert _get(origin, "/seg0.ts") == 404
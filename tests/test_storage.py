@@ -0,0 +1,120 @@
+"""
+x9k3 tests
+
+test_storage.py
+
+tests for HttpStorage, against a local stand-in origin.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from x9k3 import HttpStorage
+
+
+class _Origin(BaseHTTPRequestHandler):
+    """
+    _Origin keeps PUT files in memory, and logs requests.
+    Paths with "fail" in them get a 500.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _reply(self, code):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if "fail" in self.path:
+            self._reply(500)
+            return
+        with self.server.lock:
+            self.server.files[self.path] = body
+            self.server.log.append(("PUT", self.path))
+        self._reply(201)
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        with self.server.lock:
+            found = self.server.files.pop(self.path, None)
+            self.server.log.append(("DELETE", self.path))
+        self._reply(204 if found is not None else 404)
+
+
+@pytest.fixture
+def origin():
+    """
+    origin is a stand-in http origin on a free port.
+    """
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Origin)
+    httpd.daemon_threads = True
+    httpd.files = {}
+    httpd.log = []
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def storage(origin, tmp_path):
+    """
+    storage is a HttpStorage pushing tmp_path to origin under /live.
+    """
+    port = origin.server_address[1]
+    store = HttpStorage(f"http://127.0.0.1:{port}/live", root=str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_put_segments_and_m3u8(origin, storage, tmp_path):
+    segs = [bytes([idx]) * 188 * 10 for idx in range(8)]
+    for idx, seg in enumerate(segs):
+        storage.write(str(tmp_path / f"seg{idx}.ts"), seg)
+    storage.write(str(tmp_path / "index.m3u8"), "#EXTM3U\n")
+    storage.ready(None)
+    for idx, seg in enumerate(segs):
+        assert origin.files[f"/live/seg{idx}.ts"] == seg
+    assert origin.files["/live/index.m3u8"] == b"#EXTM3U\n"
+    # the m3u8 goes out after every segment queued before it
+    assert origin.log[-1] == ("PUT", "/live/index.m3u8")
+
+
+def test_append_uploads_whole_m3u8(origin, storage, tmp_path):
+    m3u8 = str(tmp_path / "index.m3u8")
+    storage.write(m3u8, "#EXTM3U\n")
+    storage.write(m3u8, "#EXTINF:2.000000,\nseg0.ts\n", append=True)
+    storage.ready(m3u8)
+    assert origin.files["/live/index.m3u8"] == b"#EXTM3U\n#EXTINF:2.000000,\nseg0.ts\n"
+
+
+def test_delete(origin, storage, tmp_path):
+    seg = str(tmp_path / "seg0.ts")
+    storage.write(seg, b"\x47" * 188)
+    storage.delete(seg)
+    storage.ready(None)
+    assert "/live/seg0.ts" not in origin.files
+    assert origin.log == [("PUT", "/live/seg0.ts"), ("DELETE", "/live/seg0.ts")]
+    # deleting what the origin doesn't have is not an error
+    storage.delete(seg)
+    storage.ready(None)
+
+
+def test_quoted_subdir_path(origin, storage, tmp_path):
+    storage.write(str(tmp_path / "low" / "seg 0.ts"), b"\x47" * 188)
+    storage.ready(None)
+    assert "/live/low/seg%200.ts" in origin.files
+
+
+def test_upload_error_raised_by_next_call(storage, tmp_path):
+    storage.write(str(tmp_path / "fail.m3u8"), "#EXTM3U\n")
+    with pytest.raises(OSError):
+        storage.ready(None)
+    storage.write(str(tmp_path / "ok.m3u8"), "#EXTM3U\n")
+    storage.ready(None)
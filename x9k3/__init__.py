@@ -2,9 +2,27 @@
 x9k3 init
 """
 
-from .x9k3 import X9K3, cli, decode_playlist, version,MAJOR,MINOR,MAINTAINENCE
+from .x9k3 import X9K3, cli, decode_playlist, run, version,MAJOR,MINOR,MAINTAINENCE
+from .abr import AbrLadder
+from .aio import AsyncPublisher, Pipeline
 from .argue import argue
+from .bgwriter import BackgroundPublisher
+from .channels import load_channels, run_channels
+from .config import Config
+from .cuecache import CueCache
+from .llhls import LLHls
+from .m3u8writer import M3u8Writer
+from .metrics import Metrics, MetricsDumper, MetricsServer
 from .pane import Pane
+from .parallel import decode_parallel
+from .publish import Publisher, QueuedPublisher
+from .scan import PacketBatch, Scanner
+from .scheduler import CueScheduler
 from .scte35 import SCTE35
+from .segbuffer import SegmentBuffer
+from .server import OriginServer
+from .sidecar import SidecarWatcher
+from .storage import HttpStorage, LocalStorage, MemoryStorage
+from .store import SegmentStore
 from .timer import Timer
 from .window import SlidingWindow
@@ -0,0 +1,241 @@
+"""
+x9k3
+
+abr.py
+
+home of the AbrLadder, Reference and Follower classes.
+"""
+
+import os
+import queue
+import threading
+from threefive import print2
+from .publish import Publisher
+from .server import OriginServer
+from .storage import HttpStorage
+from .x9k3 import X9K3
+
+ON = "\033[1m"
+OFF = "\033[0m"
+
+# tags each rendition makes for itself
+OWN_TAGS = ("#EXTINF", "#EXT-X-BYTERANGE", "#EXT-X-PROGRAM-DATE-TIME")
+
+
+class Rendition(X9K3):
+    """
+    Rendition is an X9K3 for one rendition
+    of an AbrLadder, it reports the peak
+    segment bitrate to the ladder.
+    """
+
+    def __init__(self, ladder, idx, config):
+        super().__init__(config=config)
+        self.ladder = ladder
+        self.idx = idx
+
+    def _write_segment_file(self, seg_name):
+        seg_time = self.now - self.started
+        bitrate = 0
+        if seg_time > 0:
+            bitrate = len(self.active_segment) * 8 / seg_time
+        super()._write_segment_file(seg_name)
+        self.ladder.set_bandwidth(self.idx, bitrate)
+
+
+class Reference(Rendition):
+    """
+    Reference segments the reference rendition
+    as usual, SCTE-35, sidecar, iframes and all,
+    and sends each cut, (end pts, tags),
+    to the followers.
+    """
+
+    def _write_segment(self):
+        segnum = self.segnum
+        end = self.now
+        super()._write_segment()
+        if self.segnum != segnum:
+            tags = list(self.window.panes[-1].tags.items())
+            self.ladder.send_cut((end, tags))
+
+
+class Follower(Rendition):
+    """
+    Follower cuts a rendition where the reference cut,
+    at the first key frame at or past the reference cut pts,
+    and copies the reference cue tags.
+    SCTE-35 isn't parsed, and iframes are only
+    checked once a cut is due.
+    """
+
+    def __init__(self, ladder, idx, config):
+        super().__init__(ladder, idx, config)
+        self.cuts = queue.Queue()
+        self.cut = None
+        self.cuts_done = False
+        self.cut_tags = []
+
+    def _next_cut(self):
+        """
+        _next_cut returns the next cut,
+        waiting for the reference if needed,
+        or None after the last cut.
+        """
+        if self.cut is None and not self.cuts_done:
+            self.cut = self.cuts.get()
+            if self.cut is None:
+                self.cuts_done = True
+        return self.cut
+
+    def _parse_scte35(self, pkt, pid):
+        """
+        _parse_scte35 is a no-op, cues come from the reference.
+        """
+
+    def _parse_decision(self, pkt):
+        super(X9K3, self)._parse(pkt)
+        pkt_pid = self._parse_pid(pkt[1], pkt[2])
+        self.last_pts = self.now
+        self.now = self.pid2pts(pkt_pid)
+        if not self.started:
+            self._start_next_start(pts=self.now)
+        if self._pusi_flag(pkt) and self.started:
+            cut = self._next_cut()
+            if cut and self.now >= cut[0] - 0.001:
+                i_pts = self.iframer.parse(pkt)
+                if i_pts:
+                    self.now = i_pts
+                    self.cut_tags = cut[1]
+                    self.cut = None
+                    self._write_segment()
+            if self.llhls and self.started:
+                self._chk_part(None)
+
+    def _mk_a_pane_tags(self, a_pane, seg_time):
+        for tag, val in self.cut_tags:
+            if tag not in OWN_TAGS:
+                a_pane.add_tag(tag, val)
+        super()._mk_a_pane_tags(a_pane, seg_time)
+
+    def _last_buff(self):
+        cut = self._next_cut()
+        if cut:
+            self.cut_tags = cut[1]
+        super()._last_buff()
+
+
+class AbrLadder:
+    """
+    AbrLadder segments several renditions of the
+    same content in one process, with aligned cuts.
+
+    The first rendition is the reference, cut points
+    and cue state are worked out once, from it,
+    and every other rendition follows them.
+    Each rendition is written to its own directory,
+    v0, v1, ..., under config.output_dir,
+    with a master.m3u8 listing them.
+    With http_port set, one OriginServer serves them all,
+    blocking reloads follow the reference.
+    """
+
+    def __init__(self, renditions, config):
+        if isinstance(renditions, str):
+            renditions = renditions.split(",")
+        self.renditions = [rendition.strip() for rendition in renditions]
+        self.config = config
+        self.bandwidths = [0] * len(self.renditions)
+        self.followers = []
+        self.lock = threading.Lock()
+        storage = None
+        if config.output_url:
+            storage = HttpStorage(config.output_url, config.output_dir)
+        self.publisher = Publisher(atomic=True, storage=storage)
+
+    def _rendition_config(self, idx, rendition):
+        changes = {
+            "input": rendition,
+            "output_dir": os.path.join(self.config.output_dir, f"v{idx}"),
+            "renditions": None,
+            "http_port": 0,
+        }
+        if idx:
+            changes["sidecar_file"] = None
+        if self.config.output_url:
+            changes["output_url"] = f"{self.config.output_url.rstrip('/')}/v{idx}"
+        return self.config.replace(**changes)
+
+    def set_bandwidth(self, idx, bitrate):
+        """
+        set_bandwidth records the peak bitrate
+        of rendition idx, and rewrites master.m3u8
+        when it goes up.
+        """
+        with self.lock:
+            if bitrate > self.bandwidths[idx]:
+                self.bandwidths[idx] = int(bitrate)
+                self.write_master()
+
+    def send_cut(self, cut):
+        """
+        send_cut passes a cut from the reference
+        to the followers, None ends the cuts.
+        """
+        for follower in self.followers:
+            follower.cuts.put(cut)
+
+    def write_master(self):
+        """
+        write_master writes master.m3u8.
+        """
+        lines = ["#EXTM3U", "#EXT-X-VERSION:4"]
+        for idx, bandwidth in enumerate(self.bandwidths):
+            lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth}")
+            lines.append(f"v{idx}/index.m3u8")
+        master = os.path.join(self.config.output_dir, "master.m3u8")
+        self.publisher.publish_m3u8(master, "\n".join(lines) + "\n")
+
+    def _run_reference(self, reference):
+        try:
+            reference.decode()
+        finally:
+            self.send_cut(None)
+
+    def _run_follower(self, follower):
+        try:
+            follower.decode()
+        except Exception as err:  # pylint: disable=broad-except
+            print2(f"{ON}rendition {follower.args.input} stopped: {err}{OFF}")
+
+    def decode(self):
+        """
+        decode segments all the renditions.
+        """
+        if not os.path.isdir(self.config.output_dir):
+            os.mkdir(self.config.output_dir)
+        reference = Reference(
+            self, 0, self._rendition_config(0, self.renditions[0])
+        )
+        self.followers = [
+            Follower(self, idx, self._rendition_config(idx, rendition))
+            for idx, rendition in enumerate(self.renditions)
+            if idx
+        ]
+        threads = [
+            threading.Thread(target=self._run_follower, args=(follower,))
+            for follower in self.followers
+        ]
+        if self.config.http_port:
+            hold = 3 * int(self.config.time + 1)
+            reference.origin = OriginServer(
+                self.config.output_dir, self.config.http_port, hold=hold
+            )
+            reference.origin.start()
+        for thread in threads:
+            thread.start()
+        self._run_reference(reference)
+        for thread in threads:
+            thread.join()
+        self.write_master()
+        self.publisher.close()
@@ -0,0 +1,144 @@
+"""
+x9k3
+
+aio.py
+
+home of the AsyncPublisher and Pipeline classes.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from .hlspull import HlsPull
+from .publish import QueuedPublisher
+from .x9k3 import CHUNK_PKTS
+
+
+class AsyncPublisher(QueuedPublisher):
+    """
+    AsyncPublisher queues writes on a bounded asyncio.Queue,
+    the writer task runs them, in order, on its own thread.
+    submit blocks the caller while the queue is full.
+    """
+
+    def __init__(self, publisher, loop, size=8):
+        super().__init__(publisher)
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+        self.pool = ThreadPoolExecutor(max_workers=1)
+
+    def submit(self, job):
+        """
+        submit queues job from the parser thread.
+        """
+        self._chk_error()
+        asyncio.run_coroutine_threadsafe(self.queue.put(job), self.loop).result()
+
+    def drain(self):
+        """
+        drain waits, from the parser thread,
+        for the queued jobs to run.
+        """
+        asyncio.run_coroutine_threadsafe(self.queue.join(), self.loop).result()
+        self._chk_error()
+
+    async def write(self):
+        """
+        write is the writer task.
+        """
+        while True:
+            job = await self.queue.get()
+            try:
+                await self.loop.run_in_executor(self.pool, job)
+            except Exception as err:  # pylint: disable=broad-except
+                self.error = err
+            finally:
+                self.queue.task_done()
+
+
+class Pipeline:
+    """
+    Pipeline runs an X9K3 as three asyncio stages,
+    joined by bounded queues:
+
+        reader  reads chunks of packets from the input
+        parser  runs the X9K3 cut logic on each chunk
+        writer  writes segments and m3u8s (AsyncPublisher)
+
+    Blocking calls run on one thread per stage,
+    so a slow read or write only stalls its own stage
+    until a queue fills up.
+    """
+
+    def __init__(self, x9, queue_size=8):
+        self.x9 = x9
+        self.queue_size = queue_size
+        self.reader_pool = ThreadPoolExecutor(max_workers=1)
+        self.parser_pool = ThreadPoolExecutor(max_workers=1)
+
+    def _chunks(self):
+        """
+        _chunks yields chunks of packets from the input.
+        """
+        if self.x9.is_m3u8():
+            size = self.x9.PACKET_SIZE * CHUNK_PKTS
+            for _, data in HlsPull(self.x9.args.input):
+                for start in range(0, len(data), size):
+                    yield data[start : start + size]
+        else:
+            yield from self.x9.iter_pkts(num_pkts=CHUNK_PKTS)
+
+    async def _read(self, chunks):
+        loop = asyncio.get_running_loop()
+        pkts = self._chunks()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self.reader_pool, next, pkts, None)
+                if chunk is None:
+                    return
+                await chunks.put(chunk)
+        finally:
+            await chunks.put(None)
+
+    async def _parse(self, chunks):
+        loop = asyncio.get_running_loop()
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                break
+            await loop.run_in_executor(self.parser_pool, self.x9._parse_chunk, chunk)
+        await loop.run_in_executor(self.parser_pool, self.x9.addendum)
+
+    async def decode(self):
+        """
+        decode runs the stages until the input ends.
+        """
+        loop = asyncio.get_running_loop()
+        publisher = self.x9.publisher
+        async_publisher = AsyncPublisher(publisher, loop, self.queue_size)
+        self.x9.publisher = async_publisher
+        self.x9.m3u8_writer.publisher = async_publisher
+        writer = asyncio.create_task(async_publisher.write())
+        try:
+            found = True
+            if not self.x9.is_m3u8():
+                found = await loop.run_in_executor(self.parser_pool, self.x9._find_start)
+            chunks = asyncio.Queue(self.queue_size)
+            if found:
+                await asyncio.gather(self._read(chunks), self._parse(chunks))
+            else:
+                await loop.run_in_executor(self.parser_pool, self.x9.addendum)
+        finally:
+            writer.cancel()
+            async_publisher.pool.shutdown()
+            self.x9.publisher = publisher
+            self.x9.m3u8_writer.publisher = publisher
+
+    def run(self):
+        """
+        run runs decode in a new event loop.
+        """
+        try:
+            asyncio.run(self.decode())
+        finally:
+            self.reader_pool.shutdown()
+            self.parser_pool.shutdown()
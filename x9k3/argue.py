@@ -15,9 +15,10 @@ ON = "\033[1m"
 OFF = "\033[0m"
 
 
-def argue():
+def argue(argv=None):
     """
-    argue parse command line args
+    argue parse command line args,
+    argv defaults to sys.argv[1:]
     """
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -143,6 +144,118 @@ def argue():
         const=True,
         help=f"disable #EXT-X-DISCONTINUITY tags on ad breaks   [default:{ON}False{OFF}]",
     )
+    parser.add_argument(
+        "-A",
+        "--atomic",
+        action="store_const",
+        default=False,
+        const=True,
+        help=f"write to a temp file and rename into place   [default:{ON}False{OFF}]",
+    )
+    parser.add_argument(
+        "-F",
+        "--fsync",
+        default="none",
+        help=f"fsync policy: none, segment, or N for every N segments   [default:{ON}none{OFF}]",
+    )
+    parser.add_argument(
+        "-K",
+        "--copy_range",
+        action="store_const",
+        default=False,
+        const=True,
+        help=f"copy segments by byte range from a local mpegts input   [default:{ON}False{OFF}]",
+    )
+    parser.add_argument(
+        "-P",
+        "--parallel",
+        default=0,
+        type=int,
+        help=f"segment a vod file, or the entries of a vod playlist, with N processes   [default:{ON}0{OFF}]",
+    )
+    parser.add_argument(
+        "-a",
+        "--aio",
+        action="store_const",
+        default=False,
+        const=True,
+        help=f"asyncio pipeline, read, parse and write in separate stages   [default:{ON}False{OFF}]",
+    )
+    parser.add_argument(
+        "-W",
+        "--writer_queue",
+        default=0,
+        type=int,
+        help=f"write on a background thread, queue up to N writes, 0 is off   [default:{ON}0{OFF}]",
+    )
+    parser.add_argument(
+        "-V",
+        "--verify_time",
+        action="store_const",
+        default=False,
+        const=True,
+        help=f"re-read long segments when the parsed duration looks wrong   [default:{ON}False{OFF}]",
+    )
+    parser.add_argument(
+        "-L",
+        "--part_time",
+        default=0,
+        type=float,
+        help=f"low latency hls, EXT-X-PART duration in seconds, 0 is off   [default:{ON}0{OFF}]",
+    )
+    parser.add_argument(
+        "-H",
+        "--http_port",
+        default=0,
+        type=int,
+        help=f"serve output_dir over http on port N, with blocking reload, 0 is off   [default:{ON}0{OFF}]",
+    )
+    parser.add_argument(
+        "-M",
+        "--memory",
+        action="store_const",
+        default=False,
+        const=True,
+        help=f"serve segments from memory over http_port, don't write them to disk   [default:{ON}False{OFF}]",
+    )
+    parser.add_argument(
+        "-U",
+        "--output_url",
+        default=None,
+        help=f"push segments and index.m3u8 to an http origin with PUT   [default:{ON}None{OFF}]",
+    )
+    parser.add_argument(
+        "-u",
+        "--uploads",
+        default=4,
+        type=int,
+        help=f"concurrent segment uploads for output_url   [default:{ON}4{OFF}]",
+    )
+    parser.add_argument(
+        "-m",
+        "--metrics_port",
+        default=0,
+        type=int,
+        help=f"serve prometheus metrics on port N, 0 is off   [default:{ON}0{OFF}]",
+    )
+    parser.add_argument(
+        "-j",
+        "--metrics_json",
+        default=None,
+        help=f"dump metrics as json to this file every segment time   [default:{ON}None{OFF}]",
+    )
+    parser.add_argument(
+        "-R",
+        "--renditions",
+        default=None,
+        help=f"comma separated renditions for abr, the first is the reference   [default:{ON}None{OFF}]",
+    )
+    parser.add_argument(
+        "-C",
+        "--channels",
+        default=None,
+        help=f"json channel config file, segment many channels in one process   [default:{ON}None{OFF}]",
+    )
     parser.add_argument(
         "-v",
         "--version",
@@ -151,4 +264,4 @@ def argue():
         const=True,
         help="Show version",
     )
-    return parser.parse_args()
+    return parser.parse_args(argv)
@@ -0,0 +1,78 @@
+"""
+x9k3
+
+bgwriter.py
+
+home of the BackgroundPublisher class.
+"""
+
+import queue
+import threading
+from .publish import QueuedPublisher
+
+
+class BackgroundPublisher(QueuedPublisher):
+    """
+    BackgroundPublisher runs writes on a writer thread,
+    so parsing doesn't wait on the disk.
+
+    Jobs run one at a time in the order submitted,
+    so a m3u8 is published only after the segment
+    before it has been written. The queue holds
+    size jobs, submit blocks while it is full.
+
+    depth is the number of queued jobs,
+    max_depth is the most there have been.
+    """
+
+    def __init__(self, publisher, size=8):
+        super().__init__(publisher)
+        self.queue = queue.Queue(maxsize=size)
+        self.max_depth = 0
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self):
+        """
+        depth returns the number of queued jobs.
+        """
+        return self.queue.qsize()
+
+    def _write(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                job()
+            except Exception as err:  # pylint: disable=broad-except
+                self.error = err
+            finally:
+                self.queue.task_done()
+
+    def submit(self, job):
+        """
+        submit queues job for the writer thread.
+        """
+        self._chk_error()
+        self.queue.put(job)
+        self.max_depth = max(self.max_depth, self.depth)
+
+    def drain(self):
+        """
+        drain waits for the writer thread
+        to run the queued jobs.
+        """
+        self.queue.join()
+        self._chk_error()
+
+    def close(self):
+        """
+        close waits for the queued jobs,
+        closes publisher and stops the writer thread.
+        """
+        super().close()
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
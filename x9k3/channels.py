@@ -0,0 +1,155 @@
+"""
+x9k3
+
+channels.py
+
+home of the functions to run
+many X9K3 segmenters in one process.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from threefive import print2
+from .config import Config
+from .x9k3 import run
+
+ON = "\033[1m"
+OFF = "\033[0m"
+
+ALIASES = {"sidecar": "sidecar_file"}
+
+
+def load_channels(config_file):
+    """
+    load_channels reads a json channel config file.
+    The config is a list of channels, or {"channels": [ ... ]}.
+    Each channel is a dict of x9k3 options by long name,
+
+    [
+        {"input": "/home/a/one.ts", "output_dir": "one", "time": 2},
+        {"input": "udp://@235.35.3.5:3535", "output_dir": "two",
+         "hls_tag": "x_scte35", "sidecar_file": "two.txt", "live": true}
+    ]
+    """
+    with open(config_file, "r", encoding="utf8") as config:
+        channels = json.load(config)
+    if isinstance(channels, dict):
+        channels = channels["channels"]
+    return channels
+
+
+def channel_config(channel):
+    """
+    channel_config returns a Config
+    made from the channel options.
+    """
+    return Config(**{ALIASES.get(key, key): val for key, val in channel.items()})
+
+
+def run_channel(channel):
+    """
+    run_channel segments one channel,
+    errors are printed, not raised,
+    so other channels keep running.
+    Returns True if the channel finished.
+    """
+    try:
+        run(channel_config(channel))
+    except Exception as err:  # pylint: disable=broad-except
+        print2(f"{ON}channel {channel.get('input')} stopped: {err}{OFF}")
+        return False
+    return True
+
+
+def _stopped(channels, err):
+    """
+    _stopped prints err for channels,
+    and returns their inputs.
+    """
+    inputs = [channel.get("input") for channel in channels]
+    print2(f"{ON}channels {inputs} stopped: {err!r}{OFF}")
+    return inputs
+
+
+def run_group(channels):
+    """
+    run_group runs each channel on its own thread,
+    so a stalled input only stalls its own channel.
+    Returns the inputs of the channels that failed.
+    """
+    with ThreadPoolExecutor(max_workers=max(len(channels), 1)) as pool:
+        jobs = [pool.submit(run_channel, channel) for channel in channels]
+        wait(jobs)
+    failed = []
+    for channel, job in zip(channels, jobs):
+        try:
+            if not job.result():
+                failed.append(channel.get("input"))
+        except Exception as err:  # pylint: disable=broad-except
+            failed += _stopped([channel], err)
+    return failed
+
+
+def _port_span(channels):
+    """
+    _port_span returns how many ports the
+    metrics ports of channels span.
+    """
+    ports = [chan["metrics_port"] for chan in channels if chan.get("metrics_port")]
+    if not ports:
+        return 0
+    return max(ports) - min(ports) + 1
+
+
+def _worker_channels(channels, worker, span):
+    """
+    _worker_channels returns channels for worker,
+    a metrics port or json file can only be used
+    by one process, so worker N adds N * span
+    to metrics_port, and puts .N before the
+    extension of metrics_json.
+    """
+    if not worker:
+        return channels
+    found = []
+    for channel in channels:
+        channel = dict(channel)
+        if channel.get("metrics_port"):
+            channel["metrics_port"] += worker * span
+        if channel.get("metrics_json"):
+            root, ext = os.path.splitext(channel["metrics_json"])
+            channel["metrics_json"] = f"{root}.{worker}{ext}"
+        found.append(channel)
+    return found
+
+
+def run_channels(channels, workers=None):
+    """
+    run_channels spreads channels over a pool of
+    worker processes, one per core by default,
+    each worker runs its channels with run_group.
+    Each worker gets its own metrics ports and
+    json files, see _worker_channels.
+    Returns the inputs of the channels that failed.
+    """
+    if not workers:
+        workers = os.cpu_count() or 1
+    workers = max(min(workers, len(channels)), 1)
+    groups = [channels[idx::workers] for idx in range(workers)]
+    if workers == 1:
+        return run_group(channels)
+    span = _port_span(channels)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [
+            pool.submit(run_group, _worker_channels(group, idx, span))
+            for idx, group in enumerate(groups)
+        ]
+        wait(jobs)
+    failed = []
+    for group, job in zip(groups, jobs):
+        try:
+            failed += job.result()
+        except Exception as err:  # pylint: disable=broad-except
+            failed += _stopped(group, err)
+    return failed
@@ -0,0 +1,64 @@
+"""
+x9k3
+
+checkpoint.py
+
+home of the Checkpoint class.
+"""
+
+import json
+import os
+
+VERSION = 1
+
+
+class Checkpoint:
+    """
+    Checkpoint saves the state needed to continue
+    an index.m3u8 in a small json file next to it,
+    index.m3u8.x9k3.json for index.m3u8.
+
+    The checkpoint holds the size of the m3u8 it was
+    saved with, if the m3u8 has changed since,
+    the checkpoint is not used.
+    """
+
+    def __init__(self, m3u8uri=None):
+        self.m3u8uri = m3u8uri
+
+    def path(self):
+        """
+        path returns the checkpoint file path.
+        """
+        return f"{self.m3u8uri}.x9k3.json"
+
+    def save(self, state):
+        """
+        save writes state, a dict, to the checkpoint file,
+        via a temporary file, so a reader never
+        sees a partial checkpoint.
+        Nothing is saved without the m3u8.
+        """
+        if not os.path.isfile(self.m3u8uri):
+            return
+        state = dict(state, version=VERSION, m3u8_size=os.path.getsize(self.m3u8uri))
+        tmp_path = f"{self.path()}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as tmp_file:
+            json.dump(state, tmp_file, separators=(",", ":"))
+        os.replace(tmp_path, self.path())
+
+    def load(self):
+        """
+        load returns the saved state, or None if there is
+        no checkpoint, or it doesn't match the m3u8.
+        """
+        try:
+            with open(self.path(), "r", encoding="utf8") as state_file:
+                state = json.load(state_file)
+            if state.get("version") != VERSION:
+                return None
+            if state.get("m3u8_size") != os.path.getsize(self.m3u8uri):
+                return None
+        except (OSError, ValueError):
+            return None
+        return state
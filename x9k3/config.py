@@ -0,0 +1,111 @@
+"""
+x9k3
+
+config.py
+
+home of the Config class.
+"""
+
+ON = "\033[1m"
+OFF = "\033[0m"
+
+# (name, default, type) in the same order as argue()
+FIELDS = (
+    ("input", None, None),
+    ("sidecar_file", None, None),
+    ("output_dir", ".", str),
+    ("time", 2, float),
+    ("hls_tag", "x_cue", str),
+    ("window_size", 5, int),
+    ("live", False, bool),
+    ("iframe", False, bool),
+    ("byterange", False, bool),
+    ("continue_m3u8", False, bool),
+    ("delete", False, bool),
+    ("no_throttle", False, bool),
+    ("program_date_time", False, bool),
+    ("replay", False, bool),
+    ("shulga", False, bool),
+    ("no_discontinuity", False, bool),
+    ("atomic", False, bool),
+    ("fsync", "none", str),
+    ("copy_range", False, bool),
+    ("parallel", 0, int),
+    ("aio", False, bool),
+    ("writer_queue", 0, int),
+    ("verify_time", False, bool),
+    ("part_time", 0, float),
+    ("http_port", 0, int),
+    ("memory", False, bool),
+    ("output_url", None, None),
+    ("uploads", 4, int),
+    ("metrics_port", 0, int),
+    ("metrics_json", None, None),
+    ("renditions", None, None),
+    ("channels", None, None),
+    ("version", False, bool),
+)
+
+
+class Config:
+    """
+    Config holds the X9K3 settings,
+    the same settings as the command line args.
+
+    Config is plain attributes with __slots__,
+    making one doesn't touch sys.argv or argparse,
+    so a segmenter can be made cheaply from code:
+
+        from x9k3 import X9K3, Config
+        config = Config(input="video.ts", output_dir="out", time=4)
+        X9K3(config=config).decode()
+
+    Unknown settings raise a ValueError, values are
+    converted to the type of the setting, (time is a float).
+    """
+
+    __slots__ = tuple(field[0] for field in FIELDS)
+
+    def __init__(self, **kwargs):
+        for name, default, _ in FIELDS:
+            setattr(self, name, default)
+        self.update(**kwargs)
+
+    def update(self, **kwargs):
+        """
+        update sets settings by name.
+        """
+        types = {name: kind for name, _, kind in FIELDS}
+        for name, val in kwargs.items():
+            if name not in types:
+                raise ValueError(f"{ON}unknown setting {name}{OFF}")
+            if types[name] and val is not None:
+                val = types[name](val)
+            setattr(self, name, val)
+        return self
+
+    def replace(self, **kwargs):
+        """
+        replace returns a copy of the Config
+        with any kwargs changed.
+        """
+        return Config(**dict(self.items())).update(**kwargs)
+
+    def items(self):
+        """
+        items returns (name, value) pairs
+        for all settings, in argue() order.
+        """
+        return [(name, getattr(self, name)) for name in self.__slots__]
+
+    @classmethod
+    def from_args(cls, args):
+        """
+        from_args makes a Config from
+        the argparse.Namespace returned by argue().
+        """
+        return cls(**vars(args))
+
+    def __repr__(self):
+        settings = ", ".join(f"{name}={val!r}" for name, val in self.items())
+        return f"Config({settings})"
@@ -0,0 +1,119 @@
+"""
+x9k3
+
+cuecache.py
+
+home of the CueCache class.
+"""
+
+from collections import OrderedDict
+from threefive import Cue
+
+
+class CachedCue:
+    """
+    CachedCue holds a decoded Cue and
+    its base64 and hex encodings.
+    """
+
+    def __init__(self, cue):
+        self.cue = cue
+        self._b64 = None
+        self._hex = None
+
+    def b64(self):
+        """
+        b64 returns the cue encoded as base64,
+        it is encoded once.
+        """
+        if self._b64 is None:
+            self._b64 = self.cue.encode()
+        return self._b64
+
+    def hex(self):
+        """
+        hex returns the cue encoded as hex,
+        it is encoded once.
+        """
+        if self._hex is None:
+            self._hex = self.cue.encode_as_hex()
+        return self._hex
+
+
+class CueCache:
+    """
+    CueCache is a bounded LRU cache of decoded Cues,
+    keyed by raw cue data, (base64, hex or bytes),
+    and by the Cue itself. Each distinct cue is
+    decoded once, and encoded once.
+    """
+
+    def __init__(self, size=256):
+        self.size = size
+        self.entries = OrderedDict()
+
+    def _get(self, key):
+        entry = self.entries.get(key)
+        if entry:
+            self.entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    @staticmethod
+    def _data_key(data):
+        if isinstance(data, str):
+            return data.strip()
+        return bytes(data)
+
+    def _entry(self, cue):
+        """
+        _entry returns the CachedCue for a Cue instance.
+        Entries are also keyed by id, and hold
+        a reference to the cue so the id can't be reused.
+        """
+        key = ("id", id(cue))
+        entry = self._get(key)
+        if not entry:
+            entry = CachedCue(cue)
+            self._put(key, entry)
+        return entry
+
+    def decode(self, data):
+        """
+        decode returns a decoded Cue for data,
+        decoding data only the first time it is seen.
+        """
+        key = self._data_key(data)
+        entry = self._get(key)
+        if not entry:
+            cue = Cue(key)
+            cue.decode()
+            entry = self._entry(cue)
+            self._put(key, entry)
+        return entry.cue
+
+    def add(self, cue):
+        """
+        add caches an already decoded Cue
+        under its base64 encoding, and returns it.
+        """
+        entry = self._entry(cue)
+        self._put(entry.b64(), entry)
+        return entry.b64()
+
+    def b64(self, cue):
+        """
+        b64 returns the base64 encoding of cue.
+        """
+        return self._entry(cue).b64()
+
+    def hex(self, cue):
+        """
+        hex returns the hex encoding of cue.
+        """
+        return self._entry(cue).hex()
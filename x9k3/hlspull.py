@@ -0,0 +1,186 @@
+"""
+x9k3
+
+hlspull.py
+
+home of the HlsPull class.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from new_reader import reader
+from threefive import print2
+
+ON = "\033[1m"
+OFF = "\033[0m"
+
+
+def _clean_line(line):
+    if isinstance(line, bytes):
+        line = line.decode(errors="ignore")
+    return line.replace("\n", "").replace("\r", "")
+
+
+class HlsPull:
+    """
+    HlsPull pulls mpegts segments from a m3u8,
+    and is iterated for (media, data) pairs.
+
+    A background thread reloads the m3u8
+    every #EXT-X-TARGETDURATION seconds,
+    or half that when nothing new was found,
+    and fetches only segments with a media sequence
+    number past the last one fetched. Media already
+    fetched are also tracked in a bounded set,
+    in case the media sequence is missing or reset.
+
+    Segments are fetched ahead into a bounded queue,
+    so the next segment downloads while
+    the current one is being parsed.
+    The pull ends at #EXT-X-ENDLIST.
+    """
+
+    def __init__(self, manifest, prefetch=2, max_media=10101):
+        self.manifest = manifest
+        based = manifest.rsplit("/", 1)
+        self.base_uri = ""
+        if len(based) > 1:
+            self.base_uri = f"{based[0]}/"
+        self.target_duration = 2.0
+        self.last_seq = None
+        self.max_media = max_media
+        self.seen = set()
+        self.seen_order = deque()
+        self.queue = queue.Queue(maxsize=prefetch)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _mark_seen(self, media):
+        self.seen.add(media)
+        self.seen_order.append(media)
+        while len(self.seen_order) > self.max_media:
+            self.seen.discard(self.seen_order.popleft())
+
+    def _media_uri(self, line):
+        if self.base_uri not in line:
+            return self.base_uri + line
+        return line
+
+    def _read_m3u8(self):
+        """
+        _read_m3u8 reloads the m3u8 and returns
+        a list of (sequence, media) pairs,
+        and True if the m3u8 has an #EXT-X-ENDLIST tag.
+        Without #EXT-X-MEDIA-SEQUENCE, sequence is None.
+        """
+        media_seq = None
+        found = []
+        with reader(self.manifest) as manifesto:
+            lines = manifesto.readlines()
+        for line in lines:
+            if not line:
+                break
+            line = _clean_line(line)
+            if "ENDLIST" in line:
+                return found, True
+            if line.startswith("#EXT-X-TARGETDURATION:"):
+                self.target_duration = float(line.split(":", 1)[1])
+            elif line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+                media_seq = int(line.split(":", 1)[1])
+            elif line and not line.startswith("#"):
+                seq = None
+                if media_seq is not None:
+                    seq = media_seq + len(found)
+                found.append((seq, self._media_uri(line)))
+        return found, False
+
+    def _new_media(self, found):
+        """
+        _new_media returns the media in found
+        that haven't been fetched yet.
+        Media without a sequence are checked
+        against self.seen alone.
+        """
+        last = found[-1][0] if found else None
+        if last is not None and self.last_seq is not None and last < self.last_seq:
+            self.last_seq = None
+        fresh = []
+        for seq, media in found:
+            if seq is not None:
+                if self.last_seq is not None and seq <= self.last_seq:
+                    continue
+                self.last_seq = seq
+            if media not in self.seen:
+                self._mark_seen(media)
+                fresh.append(media)
+        return fresh
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fetch(self, media):
+        try:
+            with reader(media) as seg:
+                return self._put((media, seg.read()))
+        except OSError as err:
+            print2(f"{ON}skipping {media}: {err}{OFF}")
+        return True
+
+    def _pull(self):
+        """
+        _pull reloads the m3u8 and fetches new media
+        until #EXT-X-ENDLIST or stop is called.
+        """
+        while not self._stop.is_set():
+            reloaded = time.monotonic()
+            fresh, endlist = [], False
+            try:
+                found, endlist = self._read_m3u8()
+                fresh = self._new_media(found)
+            except (OSError, ValueError) as err:
+                print2(f"{ON}reloading {self.manifest}: {err}{OFF}")
+            for media in fresh:
+                if not self._fetch(media):
+                    return
+            if endlist:
+                break
+            wait = self.target_duration
+            if not fresh:
+                wait /= 2
+            self._stop.wait(max(0.0, reloaded + wait - time.monotonic()))
+        self._put(None)
+
+    def start(self):
+        """
+        start starts the pull thread.
+        """
+        self._thread = threading.Thread(target=self._pull, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        stop stops the pull thread.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def __iter__(self):
+        if not self._thread:
+            self.start()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            self.stop()
@@ -0,0 +1,139 @@
+"""
+x9k3
+
+llhls.py
+
+home of the LLHls class.
+"""
+
+import re
+
+# parts are listed for the segments in the last PART_PANES panes
+PART_PANES = 3
+
+PART_FILE = re.compile(r"seg(\d+)\.(\d+)\.ts")
+
+
+class LLHls:
+    """
+    LLHls keeps the EXT-X-PART parts of the
+    segment being made, for low latency hls.
+
+    A part is cut at the last PUSI packet within
+    part_time, from the bytes of the active
+    segment that aren't in a part yet, so parts
+    are never longer than the PART-TARGET. Segments are
+    still cut as usual, so SCTE-35 splice points
+    stay on full segment boundaries, and the last part
+    of a segment ends where the segment ends.
+
+    Part files are named seg{segnum}.{idx}.ts.
+
+    mark is the (end, pts, independent) of the last
+    PUSI packet within part_time, where the part is cut.
+
+    throttled is the time throttled for parts
+    since the last segment was throttled.
+    """
+
+    def __init__(self, part_time):
+        self.part_time = part_time
+        self.parts = []
+        self.names = []
+        self.offset = 0
+        self.started = None
+        self.independent = True
+        self.mark = None
+        self.throttled = 0.0
+
+    def header(self, can_block=False):
+        """
+        header returns the LL-HLS header lines.
+        """
+        control = f"PART-HOLD-BACK={self.part_time * 3:.3f}"
+        if can_block:
+            control = f"CAN-BLOCK-RELOAD=YES,{control}"
+        return [
+            f"#EXT-X-SERVER-CONTROL:{control}",
+            f"#EXT-X-PART-INF:PART-TARGET={self.part_time:.3f}",
+        ]
+
+    @staticmethod
+    def part_file(segnum, idx):
+        """
+        part_file returns the file name of part idx
+        of segment segnum.
+        """
+        return f"seg{segnum}.{idx}.ts"
+
+    @staticmethod
+    def part_of(name):
+        """
+        part_of returns the (segnum, idx) of
+        a part file name, or None.
+        """
+        found = PART_FILE.fullmatch(name)
+        if not found:
+            return None
+        return int(found.group(1)), int(found.group(2))
+
+    def due(self, now):
+        """
+        due returns True when a part ending
+        at now would be longer than part_time.
+        """
+        if self.started is None or now is None:
+            return False
+        return round(now - self.started, 6) > self.part_time
+
+    def chk_mark(self, end, now, independent):
+        """
+        chk_mark marks the PUSI packet at byte end
+        of the active segment, if a part ending
+        at now is within part_time.
+        """
+        if not self.due(now):
+            self.mark = (end, now, independent)
+
+    def add_part(self, part_file, part_name, duration, end, now):
+        """
+        add_part adds a part that ends at byte end
+        of the active segment, the next part starts at now.
+        """
+        line = f'#EXT-X-PART:DURATION={duration:.6f},URI="{part_file}"'
+        if self.independent:
+            line += ",INDEPENDENT=YES"
+        self.parts.append(line)
+        self.names.append(part_name)
+        self.offset = end
+        self.started = now
+        self.independent = False
+        self.mark = None
+
+    def tail(self, segnum):
+        """
+        tail returns the m3u8 lines for the segment
+        being made, its parts and a preload hint
+        for the next part.
+        """
+        hint = self.part_file(segnum, len(self.parts))
+        lines = self.parts + [f'#EXT-X-PRELOAD-HINT:TYPE=PART,URI="{hint}"', ""]
+        return "\n".join(lines)
+
+    def take_throttled(self):
+        """
+        take_throttled returns throttled and zeroes it.
+        """
+        throttled, self.throttled = self.throttled, 0.0
+        return throttled
+
+    def reset(self, pts):
+        """
+        reset starts the parts of the next segment at pts.
+        """
+        self.parts = []
+        self.names = []
+        self.offset = 0
+        self.started = pts
+        self.independent = True
+        self.mark = None
@@ -0,0 +1,89 @@
+"""
+x9k3
+
+m3u8writer.py
+
+home of the M3u8Writer class.
+"""
+
+from .publish import Publisher
+
+
+class M3u8Writer:
+    """
+    M3u8Writer writes index.m3u8.
+    When the header is unchanged and the window
+    has only grown since the last write, just the
+    new panes are appended, otherwise the whole
+    m3u8 is rewritten.
+
+    Atomic publishing can't append,
+    so the m3u8 is always replaced.
+    So is a m3u8 with a tail, the lines for the
+    segment being made in low latency hls.
+    """
+
+    def __init__(self, publisher=None):
+        self.publisher = publisher
+        if not self.publisher:
+            self.publisher = Publisher()
+        self.header = None
+        self.text = None
+        self.tail = ""
+        self.first_pane = None
+        self.pane_count = 0
+
+    def _can_append(self, header, window):
+        """
+        _can_append returns True if the m3u8 on disk
+        matches what was last written, less the new panes.
+        A pane changed since it was written is stale.
+        """
+        panes = window.panes
+        if self.publisher.atomic or self.tail or window.stale:
+            return False
+        if not self.pane_count or header != self.header:
+            return False
+        if not panes or panes[0] is not self.first_pane:
+            return False
+        return len(panes) >= self.pane_count
+
+    def _append(self, m3u8uri, panes):
+        """
+        _append writes only the panes added
+        since the last write.
+        """
+        new_panes = [panes[idx].get() for idx in range(self.pane_count, len(panes))]
+        self.publisher.append_m3u8(m3u8uri, "".join(new_panes))
+
+    def _rewrite(self, m3u8uri, header, window, tail):
+        """
+        _rewrite writes the header, all window panes and tail.
+        """
+        self.text = f"{header}{window.all_panes()}"
+        self.publisher.publish_m3u8(m3u8uri, f"{self.text}{tail}")
+
+    def write(self, m3u8uri, header, window, tail=""):
+        """
+        write updates m3u8uri with header,
+        the panes in window, and tail.
+        """
+        panes = window.panes
+        if not tail and self._can_append(header, window):
+            self._append(m3u8uri, panes)
+        else:
+            self._rewrite(m3u8uri, header, window, tail)
+        self.tail = tail
+        self.header = header
+        self.first_pane = panes[0] if panes else None
+        self.pane_count = len(panes)
+
+    def endlist(self, m3u8uri):
+        """
+        endlist adds #EXT-X-ENDLIST to m3u8uri.
+        """
+        endlist = "#EXT-X-ENDLIST"
+        if (self.publisher.atomic or self.tail) and self.text is not None:
+            self.publisher.publish_m3u8(m3u8uri, f"{self.text}{endlist}")
+        else:
+            self.publisher.append_m3u8(m3u8uri, endlist)
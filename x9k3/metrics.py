@@ -0,0 +1,320 @@
+"""
+x9k3
+
+metrics.py
+
+home of the Metrics, MetricsServer and MetricsDumper classes.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threefive import print2
+from .storage import LocalStorage
+
+ON = "\033[1m"
+OFF = "\033[0m"
+
+# histogram bucket upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# name: (type, help)
+METRICS = {
+    "x9k3_packets_total": ("counter", "mpegts packets parsed"),
+    "x9k3_bytes_total": ("counter", "bytes parsed"),
+    "x9k3_packets_per_second": ("gauge", "packets per second over the last segment"),
+    "x9k3_bytes_per_second": ("gauge", "bytes per second over the last segment"),
+    "x9k3_parse_seconds": ("histogram", "parse time per packet batch"),
+    "x9k3_iframes_total": ("counter", "key frames detected"),
+    "x9k3_iframes_per_second": (
+        "gauge",
+        "key frames detected per second over the last segment",
+    ),
+    "x9k3_segments_total": ("counter", "segments written"),
+    "x9k3_segment_write_seconds": ("histogram", "segment write latency"),
+    "x9k3_m3u8_write_seconds": ("histogram", "m3u8 write latency"),
+    "x9k3_sidecar_backlog": ("gauge", "sidecar cues waiting to be inserted"),
+    "x9k3_throttle_lead_seconds": (
+        "gauge",
+        "live throttle lead, negative is lag",
+    ),
+    "x9k3_segment_deviation_seconds": (
+        "gauge",
+        "last segment duration minus --time",
+    ),
+    "x9k3_writer_queue_depth": ("gauge", "queued background writes"),
+}
+
+
+class Metrics:
+    """
+    Metrics is the registry of one X9K3,
+    every sample gets its labels.
+
+    inc adds to a counter, set sets a gauge,
+    observe adds a value to a histogram,
+    histograms keep count, sum and a count
+    for each of BUCKETS.
+
+    Registered registries are served by MetricsServer
+    and dumped by MetricsDumper.
+    """
+
+    registries = []
+    registries_lock = threading.Lock()
+
+    def __init__(self, labels=None):
+        self.labels = dict(labels or {})
+        self.values = {}
+        self.lock = threading.Lock()
+        self.mark = None
+
+    def inc(self, name, val=1):
+        """
+        inc adds val to counter name.
+        """
+        with self.lock:
+            self.values[name] = self.values.get(name, 0) + val
+
+    def set(self, name, val):
+        """
+        set sets gauge name to val.
+        """
+        with self.lock:
+            self.values[name] = val
+
+    def observe(self, name, val):
+        """
+        observe adds val to histogram name.
+        """
+        with self.lock:
+            count, total, buckets = self.values.get(name, (0, 0.0, None))
+            buckets = list(buckets or [0] * len(BUCKETS))
+            for idx, bound in enumerate(BUCKETS):
+                if val <= bound:
+                    buckets[idx] += 1
+            self.values[name] = (count + 1, total + val, tuple(buckets))
+
+    def set_rates(self, rates):
+        """
+        set_rates sets the gauges in rates, a dict
+        of gauge: counter, to how fast each counter
+        went up since the last call.
+        """
+        now = time.monotonic()
+        with self.lock:
+            counts = {name: self.values.get(name, 0) for name in rates.values()}
+            if self.mark:
+                then, last = self.mark
+                elapsed = now - then
+                if elapsed > 0:
+                    for gauge, counter in rates.items():
+                        rate = (counts[counter] - last[counter]) / elapsed
+                        self.values[gauge] = round(rate, 3)
+            self.mark = (now, counts)
+
+    def timed(self, name):
+        """
+        timed returns a context manager that
+        observes the seconds its block takes.
+        """
+        return _Timed(self, name)
+
+    def snapshot(self):
+        """
+        snapshot returns the labels and values as a dict,
+        histograms as count, sum and buckets,
+        a count for each bucket bound.
+        """
+        with self.lock:
+            values = dict(self.values)
+        for name, val in values.items():
+            if METRICS[name][0] == "histogram":
+                count, total, buckets = val
+                buckets = dict(zip((str(bound) for bound in BUCKETS), buckets))
+                values[name] = {"count": count, "sum": total, "buckets": buckets}
+        return {"labels": self.labels, "values": values}
+
+    def _label_text(self, **extra):
+        pairs = []
+        for kay, vee in dict(self.labels, **extra).items():
+            vee = str(vee).replace("\\", "\\\\").replace('"', '\\"')
+            pairs.append(f'{kay}="{vee}"')
+        return "{" + ",".join(pairs) + "}"
+
+    def samples(self, name):
+        """
+        samples returns the prometheus sample lines for name.
+        """
+        with self.lock:
+            val = self.values.get(name)
+        if val is None:
+            return []
+        labels = self._label_text()
+        if METRICS[name][0] != "histogram":
+            return [f"{name}{labels} {val}"]
+        count, total, buckets = val
+        lines = [
+            f"{name}_bucket{self._label_text(le=bound)} {hits}"
+            for bound, hits in zip(BUCKETS, buckets)
+        ]
+        return lines + [
+            f"{name}_bucket{self._label_text(le='+Inf')} {count}",
+            f"{name}_sum{labels} {total}",
+            f"{name}_count{labels} {count}",
+        ]
+
+    def register(self):
+        """
+        register adds this registry to those served and dumped.
+        """
+        with Metrics.registries_lock:
+            Metrics.registries.append(self)
+
+    def unregister(self):
+        """
+        unregister removes this registry.
+        """
+        with Metrics.registries_lock:
+            if self in Metrics.registries:
+                Metrics.registries.remove(self)
+
+    @classmethod
+    def registered(cls):
+        """
+        registered returns the registered registries.
+        """
+        with cls.registries_lock:
+            return list(cls.registries)
+
+    @classmethod
+    def prometheus(cls):
+        """
+        prometheus returns every registered registry
+        in prometheus text format.
+        """
+        registries = cls.registered()
+        lines = []
+        for name, (kind, about) in METRICS.items():
+            samples = [line for reg in registries for line in reg.samples(name)]
+            if samples:
+                lines.append(f"# HELP {name} {about}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines += samples
+        return "\n".join(lines) + "\n"
+
+
+class _Timed:
+    """
+    _Timed observes how long its with block takes.
+    """
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.began = None
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.observe(self.name, time.perf_counter() - self.began)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    _Handler answers GET requests for a MetricsServer.
+    """
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        do_GET serves the registered registries.
+        """
+        body = Metrics.prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer:
+    """
+    MetricsServer serves the registered registries
+    in prometheus text format on port.
+
+    There's one server for each port in a process,
+    get returns it, starting it if needed.
+    """
+
+    servers = {}
+    servers_lock = threading.Lock()
+
+    def __init__(self, port, host="127.0.0.1"):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print2(f"{ON}metrics on port {port}{OFF}")
+
+    @classmethod
+    def get(cls, port):
+        """
+        get returns the MetricsServer for port.
+        """
+        with cls.servers_lock:
+            if port not in cls.servers:
+                cls.servers[port] = cls(port)
+            return cls.servers[port]
+
+
+class MetricsDumper:
+    """
+    MetricsDumper writes the registered registries
+    to a json file every interval seconds,
+    with a temporary file and a rename.
+
+    There's one dumper for each path in a process,
+    get returns it, starting it if needed.
+    """
+
+    dumpers = {}
+    dumpers_lock = threading.Lock()
+
+    def __init__(self, path, interval=2.0):
+        self.path = path
+        self.interval = interval
+        self.storage = LocalStorage()
+        self._thread = threading.Thread(target=self._dump_loop, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def get(cls, path, interval=2.0):
+        """
+        get returns the MetricsDumper for path.
+        """
+        with cls.dumpers_lock:
+            if path not in cls.dumpers:
+                cls.dumpers[path] = cls(path, interval)
+            return cls.dumpers[path]
+
+    def dump(self):
+        """
+        dump writes the json file now.
+        """
+        snapshots = [reg.snapshot() for reg in Metrics.registered()]
+        text = json.dumps({"time": time.time(), "metrics": snapshots})
+        self.storage.write(self.path, text, atomic=True)
+
+    def _dump_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.dump()
+            except OSError as err:
+                print2(f"{ON}metrics dump {self.path}: {err}{OFF}")
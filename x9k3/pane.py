@@ -18,13 +18,30 @@ class Pane:
         self.file = file
         self.name = name
         self.num = num
+        self.window = None
+        self.parts = []
+        self.part_names = []
+        self._text = None
 
     def get(self):
         """
         get returns the a_pane data formated.
+        The text is rendered once and cached
+        until add_tag is called.
+        """
+        if self._text is None:
+            self._text = self._render()
+        return self._text
+
+    def _render(self):
+        """
+        _render formats the tags and file
+        for the a_pane.
         """
         this = []
         for kay, vee in self.tags.items():
+            if kay == "#EXTINF":
+                this += self.parts
             if vee is None:
                 this.append(kay)
             else:
@@ -39,4 +56,27 @@ class Pane:
         add_tag appends key and value for a hls tag
         """
         self.tags[quay] = val
+        self._changed()
 
+    def _changed(self):
+        self._text = None
+        if self.window:
+            self.window.stale = True
+
+    def add_parts(self, parts, part_names):
+        """
+        add_parts sets the EXT-X-PART lines,
+        they go before #EXTINF.
+        """
+        self.parts = parts
+        self.part_names = part_names
+        self._changed()
+
+    def drop_parts(self):
+        """
+        drop_parts removes the EXT-X-PART lines,
+        the part files are kept until the pane is popped.
+        """
+        if self.parts:
+            self.parts = []
+            self._changed()
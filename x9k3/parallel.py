@@ -0,0 +1,300 @@
+"""
+x9k3
+
+parallel.py
+
+home of the decode_parallel function.
+"""
+
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from iframes import IFramer
+from threefive import print2
+from .playlist import _assemble, _entry_dir, _entry_result
+from .scan import PACKET_SIZE, PacketBatch
+from .sidecar import SidecarWatcher
+
+ON = "\033[1m"
+OFF = "\033[0m"
+
+SYNC_BYTE = 0x47
+# packets read at a time looking for a key frame
+SCAN_PKTS = 4096
+# how far into the file to look for the PAT and PMT
+PSI_BYTES = PACKET_SIZE * 65536
+
+
+def _pid(pkt):
+    return (pkt[1] & 0x1F) << 8 | pkt[2]
+
+
+def _payload(pkt):
+    if pkt[3] & 0x20:
+        return pkt[5 + pkt[4] :]
+    return pkt[4:]
+
+
+def _pmt_pids(pat):
+    """
+    _pmt_pids returns the PMT pids in pat,
+    a packet with a PAT that fits in one packet.
+    """
+    pay = _payload(pat)
+    pay = pay[pay[0] + 1 :]
+    seclen = (pay[1] & 0x0F) << 8 | pay[2]
+    pids = set()
+    for idx in range(8, min(3 + seclen - 4, len(pay) - 3), 4):
+        if pay[idx] << 8 | pay[idx + 1]:
+            pids.add((pay[idx + 2] & 0x1F) << 8 | pay[idx + 3])
+    return pids
+
+
+def _psi_head(tsfile):
+    """
+    _psi_head returns the first PAT packet and the first
+    packet of each PMT, to start every chunk with,
+    or None if they aren't found.
+    """
+    tsfile.seek(0)
+    data = tsfile.read(PSI_BYTES)
+    pat = None
+    pmts = {}
+    for start in range(0, len(data) - PACKET_SIZE + 1, PACKET_SIZE):
+        pkt = data[start : start + PACKET_SIZE]
+        if not pkt[1] & 0x40:
+            continue
+        pid = _pid(pkt)
+        if pat is None and pid == 0:
+            pat = pkt
+            pmts = dict.fromkeys(_pmt_pids(pat))
+        elif pid in pmts and pmts[pid] is None:
+            pmts[pid] = pkt
+        if pat and pmts and None not in pmts.values():
+            return pat + b"".join(pmts.values())
+    return None
+
+
+def _next_key(tsfile, offset, shulga):
+    """
+    _next_key returns the offset and PTS of the first
+    key frame at or after offset, or None.
+    PacketBatch finds the candidates, IFramer
+    checks them, as X9K3 does when it cuts.
+    """
+    iframer = IFramer(shush=True)
+    tsfile.seek(offset)
+    while True:
+        chunk = tsfile.read(PACKET_SIZE * SCAN_PKTS)
+        if len(chunk) < PACKET_SIZE:
+            return None
+        batch = PacketBatch(chunk)
+        keys = batch.key
+        if shulga:
+            keys = bytes(a & b for a, b in zip(batch.pusi, batch.rai))
+        for idx in batch.indices(keys):
+            pts = iframer.parse(batch.packet(idx))
+            if pts is not None:
+                return offset + batch.offset(idx), pts
+        offset += len(chunk)
+
+
+def split_points(path, parts, shulga=False):
+    """
+    split_points makes a key frame index of the
+    mpegts file at path, and returns the PSI head
+    and a list of (offset, pts) for the key frames
+    that split it into about parts chunks of the same size.
+    Returns None, [] if the file can't be split.
+    """
+    size = os.path.getsize(path)
+    points = []
+    with open(path, "rb") as tsfile:
+        if tsfile.read(1) != bytes([SYNC_BYTE]):
+            return None, []
+        head = _psi_head(tsfile)
+        if head is None:
+            return None, []
+        for part in range(1, parts):
+            target = size * part // parts
+            target -= target % PACKET_SIZE
+            if points and target <= points[-1][0]:
+                continue
+            found = _next_key(tsfile, target, shulga)
+            if found is None:
+                break
+            if not points or found[0] > points[-1][0]:
+                points.append(found)
+    return head, points
+
+
+class _ChunkReader:
+    """
+    _ChunkReader reads head, and then
+    bytes start to end of the file at path.
+    """
+
+    def __init__(self, path, head, start, end):
+        self.head = head
+        self.tsfile = open(path, "rb")  # pylint: disable=consider-using-with
+        self.tsfile.seek(start)
+        self.left = end - start
+
+    def read(self, size=-1):
+        """
+        read returns up to size bytes.
+        """
+        if size < 0:
+            size = len(self.head) + self.left
+        data = self.head[:size]
+        self.head = self.head[size:]
+        size = min(size - len(data), self.left)
+        if size > 0:
+            more = self.tsfile.read(size)
+            self.left -= len(more)
+            data += more
+        return data
+
+    def close(self):
+        """
+        close closes the file.
+        """
+        self.tsfile.close()
+
+
+def _segment_chunk(idx, chunk, cues, state, config):
+    """
+    _segment_chunk segments one chunk, a (head, start, end, end_pts)
+    tuple, into its own directory, with cues, sidecar lines,
+    scheduled first, and starting with state, the cue state
+    handed over from the chunk before it, if set.
+    Returns what _entry_result does, and the lines
+    for the cues still waiting to be spliced in.
+    """
+    from .x9k3 import X9K3  # pylint: disable=import-outside-toplevel
+
+    entry_dir = _entry_dir(config.output_dir, idx)
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    chunk_config = config.replace(
+        output_dir=entry_dir,
+        sidecar_file=None,
+        copy_range=False,
+        parallel=0,
+        continue_m3u8=False,
+    )
+    head, start, end, end_pts = chunk
+    tsdata = _ChunkReader(config.input, head, start, end)
+    try:
+        x9 = X9K3(tsdata=tsdata, config=chunk_config)
+        x9.end_pts = end_pts
+        if state:
+            x9.scte35.set_state(state)
+        for line in cues:
+            x9.add2sidecar(line)
+        x9.decode()
+    finally:
+        tsdata.close()
+    pending = [f"{pts},{cue}" for pts, cue in sorted(x9.sidecar.pending)]
+    return _entry_result(x9), pending
+
+
+def _read_sidecar(sidecar_file):
+    """
+    _read_sidecar reads and consumes the
+    lines of sidecar_file, like a vod X9K3 does.
+    """
+    if not sidecar_file:
+        return []
+    watcher = SidecarWatcher(sidecar_file)
+    watcher.start()
+    watcher.stop()
+    return watcher.lines()
+
+
+def _chunk_cues(lines, points):
+    """
+    _chunk_cues hands each sidecar line to the chunk
+    its insert pts is in, pts 0.0 goes to the first chunk.
+    """
+    cues = [[] for _ in range(len(points) + 1)]
+    for line in lines:
+        pts = float(line.split(",", 1)[0])
+        idx = sum(1 for _, key_pts in points if pts >= key_pts)
+        if pts == 0.0:
+            idx = 0
+        cues[idx].append(line)
+    return cues
+
+
+def _hands_over(pending, closing):
+    """
+    _hands_over returns True if the next chunk has to
+    be segmented again, with the cue state or pending
+    cues of the chunk before it.
+    """
+    return bool(pending or closing["cue_state"] or closing["event_id"] != 1)
+
+
+def decode_parallel(config):
+    """
+    decode_parallel segments a vod mpegts file on a pool of
+    config.parallel processes.
+
+    split_points makes a key frame index of the file, and it
+    is cut into chunks at those key frames, each chunk starts
+    with the PAT and PMT. The chunks are segmented at the same
+    time, each into its own directory, and the segments are
+    renumbered into config.output_dir by _assemble.
+
+    Segments are cut at every chunk boundary, so a segment
+    ending at a boundary can be shorter than --time.
+
+    When a chunk ends in a break, or with cues that aren't
+    spliced yet, the next chunk is segmented again with that
+    cue state and those cues handed over, so breaks and
+    splice points come out as they do in one pass.
+    Returns False if the file can't be split.
+    """
+    from .x9k3 import X9K3  # pylint: disable=import-outside-toplevel
+
+    head, points = split_points(config.input, config.parallel, config.shulga)
+    if not points:
+        print2(f"{ON}parallel couldn't split {config.input}.{OFF}")
+        return False
+    if not os.path.isdir(config.output_dir):
+        os.mkdir(config.output_dir)
+    offsets = [0] + [offset for offset, _ in points]
+    ends = offsets[1:] + [os.path.getsize(config.input)]
+    end_pts = [pts for _, pts in points] + [None]
+    heads = [b""] + [head] * len(points)
+    chunks = list(zip(heads, offsets, ends, end_pts))
+    cues = _chunk_cues(_read_sidecar(config.sidecar_file), points)
+    print2(f"{ON}segmenting {len(chunks)} chunks of {config.input}{OFF}")
+    try:
+        with ProcessPoolExecutor(max_workers=config.parallel) as pool:
+            jobs = [
+                pool.submit(_segment_chunk, idx, chunk, cues[idx], None, config)
+                for idx, chunk in enumerate(chunks)
+            ]
+            results = []
+            pending, closing = [], None
+            for idx, job in enumerate(jobs):
+                if closing and _hands_over(pending, closing):
+                    job = pool.submit(
+                        _segment_chunk,
+                        idx,
+                        chunks[idx],
+                        pending + cues[idx],
+                        closing,
+                        config,
+                    )
+                result, pending = job.result()
+                closing = result[1]
+                results.append(result)
+        x9 = X9K3(config=config)
+        panes = _assemble(results, x9, chunks=True)
+    finally:
+        for idx in range(len(chunks)):
+            shutil.rmtree(_entry_dir(config.output_dir, idx), ignore_errors=True)
+    x9.publish_panes(panes)
+    return True
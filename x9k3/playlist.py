@@ -0,0 +1,157 @@
+"""
+x9k3
+
+playlist.py
+
+home of the decode_playlist_parallel function.
+"""
+
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from threefive import print2
+from .pane import Pane
+
+ON = "\033[1m"
+OFF = "\033[0m"
+
+DISCONTINUITY = "#EXT-X-DISCONTINUITY"
+
+
+def _entry_dir(output_dir, idx):
+    return os.path.join(output_dir, f".x9k3_entry{idx}")
+
+
+def _segment_entry(idx, media, sidecar, config):
+    """
+    _segment_entry segments one playlist entry
+    into its own directory, and returns
+    a (file, tags) pair for each segment,
+    and the cue state at the end of the entry.
+    """
+    from .x9k3 import X9K3  # pylint: disable=import-outside-toplevel
+
+    print2(f"{ON}loading media {media}{OFF}")
+    entry_config = config.replace(
+        input=media,
+        sidecar_file=sidecar,
+        output_dir=_entry_dir(config.output_dir, idx),
+        parallel=0,
+        continue_m3u8=False,
+    )
+    x9 = X9K3(config=entry_config)
+    x9.decode()
+    return _entry_result(x9)
+
+
+def _entry_result(x9):
+    """
+    _entry_result returns a (file, tags) pair for each
+    segment x9 made, and its cue state at the end.
+    """
+    panes = [(a_pane.file, a_pane.tags) for a_pane in x9.window.panes]
+    return panes, x9.scte35.get_state()
+
+
+def _seg_time(tags):
+    return float(tags["#EXTINF"].rstrip(","))
+
+
+def _assemble(results, x9, chunks=False):
+    """
+    _assemble moves the segments of each entry into
+    the output_dir of x9, numbered in playlist order,
+    and returns the panes for index.m3u8.
+
+    As in decode_playlist, the last segment of every
+    entry before another gets a discontinuity tag,
+    and a break still open at the end of an entry
+    carries on into the next. x9 tags the segments
+    of the next entry with the carried cue state,
+    until the break is over.
+
+    With chunks set, the entries are chunks of one stream,
+    segmented with the cue state handed over already,
+    they are only renumbered.
+    """
+    config = x9.args
+    panes = []
+    carried = None
+    for idx, (entry, closing) in enumerate(results):
+        entry_dir = _entry_dir(config.output_dir, idx)
+        if not chunks and panes and not config.no_discontinuity:
+            panes[-1].add_tag(DISCONTINUITY, None)
+        carrying = bool(carried and carried["cue_state"]) and not chunks
+        if carrying:
+            x9.scte35.set_state(carried)
+        for seg_file, tags in entry:
+            num = len(panes)
+            new_file = f"seg{num}.ts"
+            new_name = os.path.join(config.output_dir, new_file)
+            os.replace(os.path.join(entry_dir, seg_file), new_name)
+            a_pane = Pane(new_file, new_name, num)
+            if carrying:
+                x9.carry_cue(a_pane, _seg_time(tags))
+                carrying = x9.scte35.cue_state is not None
+            for kay, vee in tags.items():
+                a_pane.tags[kay] = vee
+            panes.append(a_pane)
+        carried = closing
+        if carrying:
+            carried = x9.scte35.get_state()
+    if carried:
+        x9.scte35.set_state(carried)
+    return panes
+
+
+def _entry_sidecars(entries, sidecar):
+    """
+    _entry_sidecars returns the sidecar for each entry,
+    resolved like decode_playlist does, an entry without
+    one uses the last one named, or sidecar.
+    A sidecar is consumed by the first entry that reads it,
+    so it is only given to that entry.
+    """
+    sidecars = []
+    consumed = set()
+    for _, line_sidecar in entries:
+        sidecar = line_sidecar or sidecar
+        if sidecar in consumed:
+            sidecars.append(None)
+        else:
+            sidecars.append(sidecar)
+            consumed.add(sidecar)
+    return sidecars
+
+
+def decode_playlist_parallel(entries, config):
+    """
+    decode_playlist_parallel segments playlist entries,
+    a list of (media, sidecar) pairs, on a pool of
+    config.parallel processes, each entry into its own
+    directory, with no index.m3u8 reloads between entries.
+    The segments are then renumbered into config.output_dir
+    and one vod index.m3u8 is written.
+
+    Each entry is segmented by its own X9K3,
+    _assemble carries cue state over between entries.
+    Sidecars are resolved by _entry_sidecars.
+    """
+    from .x9k3 import X9K3  # pylint: disable=import-outside-toplevel
+
+    if not os.path.isdir(config.output_dir):
+        os.mkdir(config.output_dir)
+    sidecars = _entry_sidecars(entries, config.sidecar_file)
+    try:
+        with ProcessPoolExecutor(max_workers=config.parallel) as pool:
+            jobs = [
+                pool.submit(_segment_entry, idx, media, sidecars[idx], config)
+                for idx, (media, _) in enumerate(entries)
+            ]
+            results = [job.result() for job in jobs]
+        x9 = X9K3(config=config)
+        panes = _assemble(results, x9)
+    finally:
+        for idx in range(len(entries)):
+            shutil.rmtree(_entry_dir(config.output_dir, idx), ignore_errors=True)
+    x9.publish_panes(panes)
@@ -0,0 +1,215 @@
+"""
+x9k3
+
+publish.py
+
+home of the Publisher and QueuedPublisher classes.
+"""
+
+from abc import ABC, abstractmethod
+from functools import partial
+from .storage import LocalStorage
+
+
+class Publisher:
+    """
+    Publisher writes segments and m3u8 files
+    to storage, LocalStorage when not set.
+    With atomic set, files are written to a
+    temporary file and then renamed into place,
+    so readers never see a partial file.
+
+    fsync can be "none", "segment",
+    or a number N to fsync every N segments.
+    """
+
+    def __init__(self, atomic=False, fsync="none", storage=None):
+        self.storage = storage
+        if not self.storage:
+            self.storage = LocalStorage()
+        self.atomic = atomic
+        self.every = 0
+        self.set_fsync(fsync)
+        self.segments = 0
+        self.sync_m3u8 = False
+
+    def set_fsync(self, fsync):
+        """
+        set_fsync sets the fsync policy.
+        """
+        fsync = str(fsync).lower()
+        if fsync == "none":
+            self.every = 0
+        elif fsync == "segment":
+            self.every = 1
+        elif fsync.isdigit() and int(fsync) > 0:
+            self.every = int(fsync)
+        else:
+            raise ValueError("fsync must be none, segment, or a number N")
+
+    def _chk_sync(self):
+        """
+        _chk_sync counts a segment and returns True
+        if the fsync policy says to sync it.
+        """
+        self.segments += 1
+        sync = bool(self.every) and not self.segments % self.every
+        self.sync_m3u8 = sync
+        return sync
+
+    def publish_segment(self, path, data, sync=None):
+        """
+        publish_segment writes segment data to path,
+        and syncs it if the fsync policy says so,
+        or if sync is set.
+        data can be bytes or have a write_to method.
+        """
+        if sync is None:
+            sync = self._chk_sync()
+        self.storage.write(path, data, sync=sync, atomic=self.atomic)
+
+    def publish_m3u8(self, path, text):
+        """
+        publish_m3u8 replaces the m3u8 at path with text.
+        The m3u8 is synced when the segment
+        before it was synced.
+        """
+        self.storage.write(path, text, sync=self.sync_m3u8, atomic=self.atomic)
+
+    def append_m3u8(self, path, text):
+        """
+        append_m3u8 appends text to the m3u8 at path.
+        Appending is not atomic, callers should use
+        publish_m3u8 when self.atomic is set.
+        """
+        self.storage.write(path, text, sync=self.sync_m3u8, append=True)
+
+    def delete(self, path):
+        """
+        delete removes the segment at path.
+        """
+        self.storage.delete(path)
+
+    def call(self, job):
+        """
+        call runs job, a callable,
+        after the writes before it.
+        """
+        job()
+
+    def ready(self, path):
+        """
+        ready makes sure the segment at path
+        has been written.
+        """
+        self.storage.ready(path)
+
+    def close(self):
+        """
+        close finishes any pending writes.
+        """
+        self.storage.close()
+
+
+class QueuedPublisher(ABC):
+    """
+    QueuedPublisher hands writes to publisher,
+    in order, as jobs passed to submit,
+    so they can be run somewhere else.
+    Segment data is snapshotted first,
+    the caller is free to reuse its buffer.
+
+    Subclasses provide submit(job) and drain(),
+    drain waits for every submitted job to run.
+    A job that fails sets self.error,
+    it is raised by the next _chk_error.
+    """
+
+    def __init__(self, publisher):
+        self.publisher = publisher
+        self.error = None
+
+    def _chk_error(self):
+        if self.error:
+            error, self.error = self.error, None
+            raise error
+
+    @property
+    def atomic(self):
+        """
+        atomic is the atomic setting of publisher.
+        """
+        return self.publisher.atomic
+
+    @atomic.setter
+    def atomic(self, atomic):
+        self.publisher.atomic = atomic
+
+    def set_fsync(self, fsync):
+        """
+        set_fsync sets the fsync policy of publisher.
+        """
+        self.publisher.set_fsync(fsync)
+
+    @abstractmethod
+    def submit(self, job):
+        """
+        submit queues job, a callable.
+        """
+
+    @abstractmethod
+    def drain(self):
+        """
+        drain waits for the queued jobs.
+        """
+
+    def publish_segment(self, path, data, sync=None):
+        """
+        publish_segment queues a segment write.
+        """
+        if hasattr(data, "snapshot"):
+            data = data.snapshot()
+        else:
+            data = bytes(data)
+        self.submit(partial(self.publisher.publish_segment, path, data, sync))
+
+    def publish_m3u8(self, path, text):
+        """
+        publish_m3u8 queues a m3u8 write.
+        """
+        self.submit(partial(self.publisher.publish_m3u8, path, text))
+
+    def append_m3u8(self, path, text):
+        """
+        append_m3u8 queues a m3u8 append.
+        """
+        self.submit(partial(self.publisher.append_m3u8, path, text))
+
+    def delete(self, path):
+        """
+        delete queues a segment delete.
+        """
+        self.submit(partial(self.publisher.delete, path))
+
+    def call(self, job):
+        """
+        call queues job, a callable,
+        to run after the writes before it.
+        """
+        self.submit(job)
+
+    def ready(self, path):
+        """
+        ready waits for the queued jobs,
+        and the segment at path to be written.
+        """
+        self.drain()
+        self.publisher.ready(path)
+
+    def close(self):
+        """
+        close waits for the queued jobs,
+        and closes publisher.
+        """
+        self.drain()
+        self.publisher.close()
@@ -0,0 +1,213 @@
+"""
+x9k3
+
+scan.py
+
+home of the PacketBatch and Scanner classes.
+"""
+
+import sys
+from array import array
+
+PACKET_SIZE = 188
+IDR_NAL = b"\x00\x00\x01\x65"
+
+
+def _mk_table(test):
+    """
+    _mk_table makes a bytes.translate table
+    mapping each byte to 1 if test(byte) else 0.
+    """
+    return bytes(1 if test(byte) else 0 for byte in range(256))
+
+
+PUSI = _mk_table(lambda byte: byte & 0x40)
+AFC = _mk_table(lambda byte: byte & 0x20)
+PCR = _mk_table(lambda byte: byte & 0x10)
+RAI = _mk_table(lambda byte: byte & 0x40)
+ABC = _mk_table(lambda byte: byte & 0xA8)
+PID_HI = bytes(byte & 0x1F for byte in range(256))
+
+
+def _and(*lanes):
+    """
+    _and is an element wise AND of 0/1 byte lanes.
+    """
+    out = int.from_bytes(lanes[0], "big")
+    for lane in lanes[1:]:
+        out &= int.from_bytes(lane, "big")
+    return out.to_bytes(len(lanes[0]), "big")
+
+
+def _or(*lanes):
+    """
+    _or is an element wise OR of 0/1 byte lanes.
+    """
+    out = int.from_bytes(lanes[0], "big")
+    for lane in lanes[1:]:
+        out |= int.from_bytes(lane, "big")
+    return out.to_bytes(len(lanes[0]), "big")
+
+
+class PacketBatch:
+    """
+    PacketBatch extracts the header fields of every packet
+    in a chunk of mpegts in one pass.
+
+    Header bytes are pulled out of the chunk a byte lane
+    at a time with stride slices, and tested with
+    bytes.translate and big int bitwise math,
+    so the work runs in C, not per packet in Python.
+
+    pids is an array of pids, the flags are bytes
+    with a 0 or 1 for each packet:
+
+        pusi    payload unit start indicator
+        afc     adaptation field present
+        pcr     adaptation field has a PCR
+        rai     adaptation field random access indicator
+        key     PUSI packet that IFramer sees as a key frame
+    """
+
+    def __init__(self, chunk, start=0):
+        self.chunk = chunk
+        self.start = start
+        self.count = max((len(chunk) - start) // PACKET_SIZE, 0)
+        end = start + self.count * PACKET_SIZE
+        byte1 = chunk[start + 1 : end : PACKET_SIZE]
+        byte2 = chunk[start + 2 : end : PACKET_SIZE]
+        byte3 = chunk[start + 3 : end : PACKET_SIZE]
+        byte5 = chunk[start + 5 : end : PACKET_SIZE]
+        self.pids = self._mk_pids(byte1, byte2)
+        self.pusi = byte1.translate(PUSI)
+        self.afc = byte3.translate(AFC)
+        self.pcr = _and(self.afc, byte5.translate(PCR))
+        self.rai = _and(self.afc, byte5.translate(RAI))
+        self.key = self._mk_key(byte5)
+
+    def _mk_pids(self, byte1, byte2):
+        """
+        _mk_pids interleaves the pid bytes
+        into an array of 16 bit pids.
+        """
+        self._pid_bytes = bytearray(self.count * 2)
+        self._pid_bytes[0::2] = byte1.translate(PID_HI)
+        self._pid_bytes[1::2] = byte2
+        pids = array("H", self._pid_bytes)
+        if sys.byteorder == "little":
+            pids.byteswap()
+        return pids
+
+    def _mk_key(self, byte5):
+        """
+        _mk_key flags PUSI packets with an IDR NAL,
+        a PCR and random access indicator,
+        or any of the 0xA8 adaptation field flags.
+        """
+        flagged = _or(_and(self.pcr, self.rai), _and(self.afc, byte5.translate(ABC)))
+        key = bytearray(_and(self.pusi, flagged))
+        end = self.start + self.count * PACKET_SIZE
+        found = self.chunk.find(IDR_NAL, self.start, end)
+        while found != -1:
+            idx, rem = divmod(found - self.start, PACKET_SIZE)
+            if rem <= PACKET_SIZE - len(IDR_NAL) and self.pusi[idx]:
+                key[idx] = 1
+            found = self.chunk.find(IDR_NAL, found + 1, end)
+        return bytes(key)
+
+    def on_pids(self, pids):
+        """
+        on_pids returns a lane flagging
+        the packets on any of pids.
+        """
+        hits = bytearray(self.count)
+        for pid in pids:
+            code = pid.to_bytes(2, "big")
+            found = self._pid_bytes.find(code)
+            while found != -1:
+                if not found & 1:
+                    hits[found >> 1] = 1
+                found = self._pid_bytes.find(code, found + 1)
+        return bytes(hits)
+
+    @staticmethod
+    def indices(lane):
+        """
+        indices returns the packet indexes
+        that are set in lane.
+        """
+        found = []
+        idx = lane.find(1)
+        while idx != -1:
+            found.append(idx)
+            idx = lane.find(1, idx + 1)
+        return found
+
+    def offset(self, idx):
+        """
+        offset returns the chunk offset of packet idx.
+        """
+        return self.start + idx * PACKET_SIZE
+
+    def packet(self, idx):
+        """
+        packet returns packet idx.
+        """
+        offset = self.offset(idx)
+        return self.chunk[offset : offset + PACKET_SIZE]
+
+
+class Scanner:
+    """
+    Scanner uses PacketBatch to find the packets
+    in a chunk of mpegts that can change a cut decision.
+
+    Packets carrying a PCR and packets on self.pids
+    are always returned.
+
+    With skip_pusi, PUSI packets are returned only
+    when they are key frames, (random access packets
+    with shulga set), or the last PUSI packet before
+    another returned packet, so the PTS is current.
+    Otherwise every PUSI packet is returned.
+    """
+
+    def __init__(self):
+        self.pids = frozenset()
+        self.shulga = False
+
+    def set_pids(self, pids):
+        """
+        set_pids sets the pids to always return packets for.
+        """
+        self.pids = frozenset(pids)
+
+    def offsets(self, chunk, start=0, skip_pusi=False):
+        """
+        offsets returns a list of the offsets in chunk,
+        from start, of packets that need a closer look.
+        """
+        batch = PacketBatch(chunk, start)
+        if not batch.count:
+            return []
+        wanted = _or(batch.pcr, batch.on_pids(self.pids))
+        if not skip_pusi:
+            wanted = _or(wanted, batch.pusi)
+            return [batch.offset(idx) for idx in batch.indices(wanted)]
+        cuts = batch.key
+        if self.shulga:
+            cuts = _and(batch.pusi, batch.rai)
+        wanted = batch.indices(_or(wanted, cuts))
+        keep = set(wanted)
+        pusis = batch.indices(batch.pusi)
+        if pusis:
+            keep.add(pusis[-1])
+        last = None
+        pidx = 0
+        for idx in wanted:
+            while pidx < len(pusis) and pusis[pidx] < idx:
+                last = pusis[pidx]
+                pidx += 1
+            if last is not None:
+                keep.add(last)
+        return [batch.offset(idx) for idx in sorted(keep)]
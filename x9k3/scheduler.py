@@ -0,0 +1,97 @@
+"""
+x9k3
+
+scheduler.py
+
+home of the CueScheduler class.
+"""
+
+import heapq
+
+ROLLOVER = 95443.717678
+HALF_ROLLOVER = ROLLOVER / 2
+
+
+class CueScheduler:
+    """
+    CueScheduler holds (insert_pts, cue) pairs
+    in a min-heap keyed on insert pts.
+
+    Pending pairs are kept in a set, so a pair
+    already scheduled is not added twice,
+    and the next cue due is always at the top of the heap.
+
+    PTS is unwrapped across the 33 bit rollover,
+    so cues scheduled just after a rollover sort
+    after cues scheduled just before it.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.pending = set()
+        self.count = 0
+        self.base = 0.0
+        self.latest = None
+
+    def __len__(self):
+        return len(self.heap)
+
+    def _unwrap(self, pts):
+        """
+        _unwrap returns pts on the unwrapped timeline,
+        the rollover nearest the latest pts seen.
+        """
+        val = pts + self.base
+        if self.latest is not None:
+            if val - self.latest > HALF_ROLLOVER:
+                val -= ROLLOVER
+            elif self.latest - val > HALF_ROLLOVER:
+                val += ROLLOVER
+        return val
+
+    def _tick(self, now):
+        """
+        _tick moves the unwrapped timeline to now.
+        """
+        val = self._unwrap(now)
+        self.base = val - now
+        self.latest = val
+        return val
+
+    def add(self, insert_pts, cue):
+        """
+        add schedules cue at insert_pts,
+        returns False if it is already scheduled.
+        """
+        pair = (insert_pts, cue)
+        if pair in self.pending:
+            return False
+        self.pending.add(pair)
+        self.count += 1
+        heapq.heappush(self.heap, (self._unwrap(insert_pts), self.count, pair))
+        return True
+
+    def peek(self):
+        """
+        peek returns the next (insert_pts, cue) pair
+        without removing it, or None.
+        """
+        if self.heap:
+            return self.heap[0][2]
+        return None
+
+    def pop_due(self, started, now):
+        """
+        pop_due removes and returns the next pair with
+        started <= insert_pts <= now, or None.
+        Pairs with insert_pts before started
+        can never be due and are dropped.
+        """
+        now = self._tick(now)
+        started = self._unwrap(started)
+        while self.heap and self.heap[0][0] <= now:
+            key, _, pair = heapq.heappop(self.heap)
+            self.pending.discard(pair)
+            if key >= started:
+                return pair
+        return None
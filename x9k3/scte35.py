@@ -8,6 +8,8 @@ the SCTE35 class used by x9k3.
 
 
 import datetime
+from .cuecache import CueCache
+
 
 class SCTE35:
     """
@@ -24,6 +26,38 @@ class SCTE35:
         self.break_duration = None
         self.event_id = 1
         self.seg_type = None
+        self.cue_cache = CueCache()
+
+    def get_state(self):
+        """
+        get_state returns the cue state as a dict,
+        cue_time is left out, it is a stream pts.
+        """
+        cue = None
+        if self.cue:
+            cue = self.cue_cache.b64(self.cue)
+        return {
+            "cue": cue,
+            "cue_state": self.cue_state,
+            "break_timer": self.break_timer,
+            "break_duration": self.break_duration,
+            "event_id": self.event_id,
+            "seg_type": self.seg_type,
+        }
+
+    def set_state(self, state):
+        """
+        set_state restores the cue state
+        from a dict made by get_state.
+        """
+        self.cue = None
+        if state["cue"]:
+            self.cue = self.cue_cache.decode(state["cue"])
+        self.cue_state = state["cue_state"]
+        self.break_timer = state["break_timer"]
+        self.break_duration = state["break_duration"]
+        self.event_id = state["event_id"]
+        self.seg_type = state["seg_type"]
 
     def mk_cue_tag(self):
         """
@@ -78,7 +112,7 @@ class SCTE35:
         """
         #EXT-X-SPLICEPOINT-SCTE35
         """
-        base = f"#EXT-X-SPLICEPOINT-SCTE35:{self.cue.encode()}"
+        base = f"#EXT-X-SPLICEPOINT-SCTE35:{self.cue_cache.b64(self.cue)}"
         if self.cue_state == "OUT":
             return f"{base}"
         if self.cue_state == "IN":
@@ -89,7 +123,7 @@ class SCTE35:
         """
         #EXT-X-SCTE35
         """
-        base = f'#EXT-X-SCTE35:CUE="{self.cue.encode()}" '
+        base = f'#EXT-X-SCTE35:CUE="{self.cue_cache.b64(self.cue)}" '
         if self.cue_state == "OUT":
             return f"{base},CUE-OUT=YES "
         if self.cue_state == "IN":
@@ -110,12 +144,12 @@ class SCTE35:
 
         if self.cue_state == "OUT":
             fstart = f',START-DATE="{iso8601}"'
-            tag = f"{fbase}{fstart}{fdur},SCTE35-OUT={self.cue.encode_as_hex()}"
+            tag = f"{fbase}{fstart}{fdur},SCTE35-OUT={self.cue_cache.hex(self.cue)}"
             return tag
 
         if self.cue_state == "IN":
             fstop = f',END-DATE="{iso8601}"'
-            tag = f"{fbase}{fstop},SCTE35-IN={self.cue.encode_as_hex()}"
+            tag = f"{fbase}{fstop},SCTE35-IN={self.cue_cache.hex(self.cue)}"
             self.event_id += 1
             return tag
         return False
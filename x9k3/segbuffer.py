@@ -0,0 +1,195 @@
+"""
+x9k3
+
+segbuffer.py
+
+home of the SegmentBuffer class.
+"""
+
+import os
+
+PACKET_SIZE = 188
+BITRATE = 8000000
+
+
+class SegmentBuffer:
+    """
+    SegmentBuffer accumulates mpegts packets
+    for a segment in a preallocated bytearray.
+    The buffer is sized from bitrate * segment time,
+    allocated on the first write, reused for every
+    segment and only grows when a segment is bigger
+    than any segment before it.
+    """
+
+    def __init__(self, seconds=2, bitrate=BITRATE):
+        self.size = self._mk_size(seconds, bitrate)
+        self.buff = bytearray()
+        self.pos = 0
+
+    def __len__(self):
+        return self.pos
+
+    @staticmethod
+    def _mk_size(seconds, bitrate):
+        """
+        _mk_size returns bytes for seconds of bitrate
+        with 50% headroom, rounded up to whole packets.
+        """
+        size = int(seconds * bitrate / 8 * 1.5)
+        return (size // PACKET_SIZE + 1) * PACKET_SIZE
+
+    def _grow(self, size):
+        """
+        _grow copies the buffer into a bigger bytearray.
+        """
+        bigger = bytearray(size)
+        bigger[: self.pos] = memoryview(self.buff)[: self.pos]
+        self.buff = bigger
+
+    def resize(self, seconds, bitrate=BITRATE):
+        """
+        resize sets the buffer size to hold seconds of
+        bitrate, the buffer is grown if it is allocated.
+        The buffer never shrinks.
+        """
+        self.size = self._mk_size(seconds, bitrate)
+        if self.buff and self.size > len(self.buff):
+            self._grow(self.size)
+
+    def write(self, data):
+        """
+        write copies data into the buffer
+        with a slice assignment.
+        """
+        end = self.pos + len(data)
+        if end > len(self.buff):
+            self._grow(max(end, self.size, len(self.buff) * 2))
+        self.buff[self.pos : end] = data
+        self.pos = end
+
+    def getbuffer(self):
+        """
+        getbuffer returns a memoryview
+        of the segment data, no copy is made.
+        """
+        return memoryview(self.buff)[: self.pos]
+
+    def write_to(self, out):
+        """
+        write_to writes the segment data to
+        the file object out in one call.
+        """
+        out.write(self.getbuffer())
+
+    def snapshot(self):
+        """
+        snapshot returns a copy of the segment data,
+        for writing after the buffer is reset.
+        """
+        return bytes(self.getbuffer())
+
+    def reset(self):
+        """
+        reset empties the buffer for the next segment.
+        """
+        self.pos = 0
+
+    def close(self):
+        """
+        close releases the buffer.
+        """
+        self.buff = bytearray()
+        self.pos = 0
+
+
+class RangeSegment:
+    """
+    RangeSegment tracks a segment as a byte range
+    of a local mpegts file. Packets are counted, not copied,
+    and the segment is written with os.copy_file_range
+    or os.sendfile straight from the source file.
+    """
+
+    def __init__(self, source):
+        self.source = open(source, "rb")
+        self.start = 0
+        self.pos = 0
+        self.copier = self._copy_file_range
+        if not hasattr(os, "copy_file_range"):
+            self.copier = self._sendfile
+
+    def __len__(self):
+        return self.pos
+
+    def resize(self, seconds, bitrate=BITRATE):
+        """
+        resize is a no-op, nothing is buffered.
+        """
+
+    def write(self, data):
+        """
+        write adds the length of data to the segment.
+        """
+        self.pos += len(data)
+
+    def _copy_file_range(self, out_fd, offset, count):
+        try:
+            return os.copy_file_range(self.source.fileno(), out_fd, count, offset)
+        except OSError:
+            self.copier = self._sendfile
+            return self.copier(out_fd, offset, count)
+
+    def _sendfile(self, out_fd, offset, count):
+        try:
+            return os.sendfile(out_fd, self.source.fileno(), offset, count)
+        except (AttributeError, OSError):
+            self.copier = self._read_write
+            return self.copier(out_fd, offset, count)
+
+    def _read_write(self, out_fd, offset, count):
+        self.source.seek(offset)
+        return os.write(out_fd, self.source.read(min(count, 1 << 20)))
+
+    def write_to(self, out):
+        """
+        write_to copies the segment byte range
+        from the source file to the file object out.
+        """
+        out.flush()
+        out_fd = out.fileno()
+        offset = self.start
+        count = self.pos
+        while count > 0:
+            copied = self.copier(out_fd, offset, count)
+            if not copied:
+                break
+            offset += copied
+            count -= copied
+
+    def snapshot(self):
+        """
+        snapshot returns a RangeSegment for the current
+        byte range, sharing the source file,
+        for writing after this one is reset.
+        """
+        snap = RangeSegment.__new__(RangeSegment)
+        snap.source = self.source
+        snap.start = self.start
+        snap.pos = self.pos
+        snap.copier = getattr(snap, self.copier.__name__)
+        return snap
+
+    def reset(self):
+        """
+        reset starts the next segment
+        where this one ended.
+        """
+        self.start += self.pos
+        self.pos = 0
+
+    def close(self):
+        """
+        close closes the source file.
+        """
+        self.source.close()
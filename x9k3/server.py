@@ -0,0 +1,215 @@
+"""
+x9k3
+
+server.py
+
+home of the OriginServer class.
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from threefive import print2
+from .llhls import LLHls
+
+ON = "\033[1m"
+OFF = "\033[0m"
+
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    _Handler answers GET requests for an OriginServer.
+    """
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send(self, code, body=b"", kind="text/plain"):
+        self.send_response(code)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def _query_int(query, name):
+        vals = query.get(name)
+        if vals:
+            return int(vals[0])
+        return None
+
+    def _block(self, origin, query):
+        """
+        _block holds a playlist request with
+        _HLS_msn and _HLS_part until the playlist
+        has that segment or part, returns an error code
+        or None. _HLS_part needs _HLS_msn.
+        """
+        try:
+            msn = self._query_int(query, "_HLS_msn")
+            part = self._query_int(query, "_HLS_part")
+        except ValueError:
+            return 400
+        if msn is None:
+            if part is not None:
+                return 400
+            return None
+        if origin.too_far(msn):
+            return 400
+        if not origin.wait(msn, part):
+            return 503
+        return None
+
+    @staticmethod
+    def _hold_part(origin, path):
+        """
+        _hold_part holds a request for a part that
+        isn't there yet, (the EXT-X-PRELOAD-HINT part),
+        until the origin has it, returns True if it waited.
+        """
+        part = LLHls.part_of(os.path.basename(path))
+        if part is None or origin.too_far(part[0]):
+            return False
+        return origin.wait(*part)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        do_GET serves a file from the origin.
+        """
+        origin = self.server.origin
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        kind = CONTENT_TYPES.get(os.path.splitext(path)[1], "application/octet-stream")
+        if path.endswith(".m3u8"):
+            code = self._block(origin, parse_qs(url.query))
+            if code:
+                self._send(code)
+                return
+        body = origin.fetch(path)
+        if body is None and self._hold_part(origin, path):
+            body = origin.fetch(path)
+        if body is None:
+            self._send(404)
+            return
+        self._send(200, body, kind)
+
+
+class OriginServer:
+    """
+    OriginServer serves the output directory over http,
+    with LL-HLS blocking playlist reload.
+
+    update is called after each m3u8 write with the media
+    sequence number of the segment being made, and
+    how many of its parts are done. A request with
+    _HLS_msn and _HLS_part is held until the playlist
+    has that part, or the whole segment without _HLS_part,
+    for up to hold seconds. A request for a part that
+    isn't there yet, the preload hint, is held the same way.
+
+    With a SegmentStore, files are served
+    from the store instead of from root.
+    """
+
+    def __init__(self, root, port, host="127.0.0.1", hold=9.0, store=None):
+        self.root = os.path.abspath(root)
+        self.hold = hold
+        self.store = store
+        self.msn = -1
+        self.parts = 0
+        self.ended = False
+        self.cond = threading.Condition()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.origin = self
+        self._thread = None
+
+    @property
+    def port(self):
+        """
+        port is the port the server is bound to.
+        """
+        return self.httpd.server_address[1]
+
+    def local_path(self, url_path):
+        """
+        local_path maps url_path to a file under root,
+        or None if it points outside of it.
+        """
+        path = os.path.normpath(os.path.join(self.root, url_path.lstrip("/")))
+        if os.path.commonpath([self.root, path]) != self.root:
+            return None
+        return path
+
+    def fetch(self, url_path):
+        """
+        fetch returns the bytes for url_path,
+        or None if there aren't any.
+        """
+        path = self.local_path(url_path)
+        if path is None:
+            return None
+        if self.store is not None:
+            return self.store.get(self.store.key(path))
+        try:
+            with open(path, "rb") as served:
+                return served.read()
+        except OSError:
+            return None
+
+    def update(self, msn, parts=0):
+        """
+        update sets the media sequence number of
+        the segment being made and its number of parts.
+        """
+        with self.cond:
+            self.msn = msn
+            self.parts = parts
+            self.cond.notify_all()
+
+    def _has(self, msn, part):
+        if self.ended or self.msn > msn:
+            return True
+        return part is not None and self.msn == msn and self.parts > part
+
+    def too_far(self, msn):
+        """
+        too_far returns True for a msn more than
+        two segments past the segment being made.
+        """
+        return msn > self.msn + 2
+
+    def wait(self, msn, part=None):
+        """
+        wait blocks until the playlist has segment msn,
+        or part of it, returns False after hold seconds.
+        """
+        with self.cond:
+            return self.cond.wait_for(lambda: self._has(msn, part), self.hold)
+
+    def start(self):
+        """
+        start serves on a background thread.
+        """
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print2(f"{ON}serving {self.root} on port {self.port}{OFF}")
+
+    def stop(self):
+        """
+        stop releases held requests and stops the server.
+        """
+        with self.cond:
+            self.ended = True
+            self.cond.notify_all()
+        if self._thread:
+            self.httpd.shutdown()
+            self._thread.join()
+        self.httpd.server_close()
@@ -0,0 +1,209 @@
+"""
+x9k3
+
+sidecar.py
+
+home of the SidecarWatcher class.
+"""
+
+import os
+import queue
+import threading
+from new_reader import reader
+from threefive import print2
+
+ON = "\033[1m"
+OFF = "\033[0m"
+
+
+class SidecarWatcher:
+    """
+    SidecarWatcher watches a sidecar file for
+    new (pts, cue) lines in a background thread.
+
+    A local sidecar is checked by inode, mtime and size,
+    and only the bytes appended since the last read
+    are read. The sidecar was rewritten, and is read
+    from the start, when its inode changed, it got
+    shorter, it changed without getting longer,
+    (printf '...' > sidecar.txt with the same line),
+    or the bytes before the offset have changed.
+    Any other sidecar, (http(s)),
+    is re-read every remote_interval seconds
+    and compared to the last read.
+
+    Lines are stripped of comments and put on self.queue,
+    a thread safe queue.Queue, for the segmenter to take.
+    """
+
+    def __init__(self, sidecar_file, interval=0.1, remote_interval=2.0):
+        self.sidecar_file = sidecar_file
+        self.interval = interval
+        if not self.is_local():
+            self.interval = remote_interval
+        self.queue = queue.Queue()
+        self.offset = 0
+        self.tail = b""
+        self.stamp = None
+        self.pending = False
+        self.last_lines = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_local(self):
+        """
+        is_local returns True if the sidecar is a local file.
+        """
+        return "://" not in self.sidecar_file
+
+    def _put(self, line):
+        line = line.strip().split("#", 1)[0]
+        if line:
+            self.queue.put(line)
+
+    def _poll_local(self, whole=False):
+        """
+        _poll_local reads complete lines appended
+        since the last read. A last line without a newline
+        is read when whole is set, or once the sidecar
+        hasn't changed for an interval.
+        """
+        try:
+            stat = os.stat(self.sidecar_file)
+        except OSError:
+            return
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        settled = stamp == self.stamp
+        if settled and not (whole or self.pending):
+            return
+        if self._rewritten(stat):
+            self.offset = 0
+            self.tail = b""
+        self.stamp = stamp
+        with open(self.sidecar_file, "rb") as sidefile:
+            data = self._read_new(sidefile)
+        end = data.rfind(b"\n") + 1
+        if whole or settled:
+            end = len(data)
+        self.pending = end < len(data)
+        self.offset += end
+        if end:
+            self.tail = (self.tail + data[:end])[-64:]
+        for line in data[:end].decode(errors="ignore").splitlines():
+            self._put(line)
+
+    def _rewritten(self, stat):
+        """
+        _rewritten returns True if stat shows
+        the sidecar was replaced or rewritten
+        since the last read.
+        """
+        if self.stamp is None:
+            return False
+        ino, mtime, _ = self.stamp
+        if stat.st_ino != ino or stat.st_size < self.offset:
+            return True
+        return stat.st_size == self.offset and stat.st_mtime_ns != mtime
+
+    def _read_new(self, sidefile):
+        """
+        _read_new returns the bytes after self.offset,
+        or the whole sidecar if it was rewritten.
+        """
+        back = len(self.tail)
+        sidefile.seek(self.offset - back)
+        data = sidefile.read()
+        if data[:back] == self.tail:
+            return data[back:]
+        self.offset = 0
+        self.tail = b""
+        sidefile.seek(0)
+        return sidefile.read()
+
+    def _poll_remote(self):
+        """
+        _poll_remote re-reads the sidecar and
+        queues every line when it has changed.
+        """
+        with reader(self.sidecar_file) as sidefile:
+            lines = sidefile.readlines()
+        if lines == self.last_lines:
+            return
+        self.last_lines = lines
+        for line in lines:
+            self._put(line.decode(errors="ignore"))
+
+    def poll(self, whole=False):
+        """
+        poll checks the sidecar for new lines.
+        """
+        if self.is_local():
+            self._poll_local(whole)
+        else:
+            self._poll_remote()
+
+    def _watch(self):
+        """
+        _watch polls the sidecar every interval,
+        errors are printed and polling goes on.
+        """
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as err:  # pylint: disable=broad-except
+                print2(f"{ON}sidecar {self.sidecar_file}: {err}{OFF}")
+
+    def start(self):
+        """
+        start reads the sidecar and
+        starts the watcher thread.
+        """
+        self.poll(whole=True)
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def _consume(self):
+        """
+        _consume removes the lines already read
+        from a local sidecar. The sidecar is renamed
+        out of the way first, so lines appended while
+        it is read go to a new sidecar, and then any
+        unread bytes are appended back.
+        A sidecar that is gone has nothing to consume.
+        """
+        if not self.is_local() or not self.offset:
+            return
+        consumed = f"{self.sidecar_file}.x9k3"
+        offset, self.offset, self.tail = self.offset, 0, b""
+        try:
+            os.replace(self.sidecar_file, consumed)
+        except FileNotFoundError:
+            return
+        with open(consumed, "rb") as sidefile:
+            sidefile.seek(offset)
+            unread = sidefile.read()
+        os.unlink(consumed)
+        with open(self.sidecar_file, "ab") as sidefile:
+            sidefile.write(unread)
+
+    def stop(self):
+        """
+        stop stops the watcher thread and
+        removes the lines read from the sidecar.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._consume()
+
+    def lines(self):
+        """
+        lines returns the lines queued
+        since the last call.
+        """
+        found = []
+        while True:
+            try:
+                found.append(self.queue.get_nowait())
+            except queue.Empty:
+                return found
@@ -0,0 +1,301 @@
+"""
+x9k3
+
+storage.py
+
+home of the LocalStorage, MemoryStorage and HttpStorage classes.
+"""
+
+import http.client
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+from threefive import print2
+
+
+class LocalStorage:
+    """
+    LocalStorage writes files to the local disk.
+
+    Storage classes have the same methods,
+    write, delete, ready and close,
+    and local is True when files end up on the local disk.
+    """
+
+    local = True
+
+    @staticmethod
+    def _sync_dir(path):
+        """
+        _sync_dir fsyncs the directory holding path
+        so a rename survives a crash.
+        """
+        try:
+            dir_fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+    def write(self, path, data, sync=False, atomic=False, append=False):
+        """
+        write writes data to path, via a temporary
+        file and os.replace when atomic is set,
+        or appends it to path.
+        data can be a str, bytes, or have a write_to method.
+        """
+        mode = "w"
+        if append:
+            mode = "a"
+        encoding = None
+        if isinstance(data, str):
+            encoding = "utf8"
+        else:
+            mode = mode + "b"
+        target = path
+        if atomic and not append:
+            target = f"{path}.tmp"
+        with open(target, mode, encoding=encoding) as pub:
+            if hasattr(data, "write_to"):
+                data.write_to(pub)
+            else:
+                pub.write(data)
+            if sync:
+                pub.flush()
+                os.fsync(pub.fileno())
+        if target != path:
+            os.replace(target, path)
+        if sync:
+            self._sync_dir(path)
+
+    def delete(self, path):
+        """
+        delete removes the file at path.
+        """
+        Path(path).touch()
+        os.unlink(path)
+        print2(f"deleted {path}")
+
+    def ready(self, path):
+        """
+        ready is a no-op, files are written right away.
+        """
+
+    def close(self):
+        """
+        close is a no-op.
+        """
+
+
+class MemoryStorage:
+    """
+    MemoryStorage writes files to a SegmentStore,
+    every write replaces what was stored in one step,
+    so there's nothing for atomic or sync to do.
+    """
+
+    local = False
+
+    def __init__(self, store):
+        self.store = store
+
+    def write(self, path, data, sync=False, atomic=False, append=False):
+        """
+        write stores data for path.
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        elif hasattr(data, "snapshot"):
+            data = data.snapshot()
+        if append:
+            self.store.append(path, data)
+        else:
+            self.store.put(path, bytes(data))
+
+    def delete(self, path):
+        """
+        delete evicts path from the store.
+        """
+        self.store.evict(path)
+
+    def ready(self, path):
+        """
+        ready is a no-op, files are stored right away.
+        """
+
+    def close(self):
+        """
+        close is a no-op.
+        """
+
+
+class HttpStorage:
+    """
+    HttpStorage pushes files to an http origin
+    with PUT, (WebDAV works too), under base_url,
+    by their path relative to root.
+
+    Segments are uploaded concurrently by workers threads,
+    each with its own persistent connection.
+    A m3u8 is uploaded only after every segment
+    written before it, and m3u8s and deletes
+    go out one at a time, in order,
+    so a player never sees a segment in a m3u8
+    before the segment is there.
+
+    Appends are made to a copy of the m3u8
+    kept in memory, and the whole m3u8 is uploaded.
+    An upload error is raised by the next call.
+    """
+
+    local = False
+
+    def __init__(self, base_url, root=".", workers=4, timeout=10):
+        url = urlsplit(base_url)
+        self.scheme = url.scheme
+        self.netloc = url.netloc
+        self.base_path = url.path.rstrip("/")
+        self.root = os.path.abspath(root)
+        self.timeout = timeout
+        self.uploads = ThreadPoolExecutor(max_workers=workers)
+        self.in_order = ThreadPoolExecutor(max_workers=1)
+        self.pending = []
+        self.ordered = []
+        self.texts = {}
+        self.error = None
+        self.local_conns = threading.local()
+        self.conns = []
+        self.lock = threading.Lock()
+
+    def _conn(self):
+        """
+        _conn returns the connection of the calling thread.
+        """
+        conn = getattr(self.local_conns, "conn", None)
+        if conn is None:
+            conn_class = http.client.HTTPConnection
+            if self.scheme == "https":
+                conn_class = http.client.HTTPSConnection
+            conn = conn_class(self.netloc, timeout=self.timeout)
+            self.local_conns.conn = conn
+            with self.lock:
+                self.conns.append(conn)
+        return conn
+
+    def url_path(self, path):
+        """
+        url_path returns the url path for path.
+        """
+        key = os.path.relpath(os.path.abspath(path), self.root)
+        return f"{self.base_path}/{quote(key.replace(os.sep, '/'))}"
+
+    def _request(self, method, path, body=None):
+        """
+        _request sends a request on the connection
+        of the calling thread, reconnecting once
+        if the connection was dropped.
+        """
+        url_path = self.url_path(path)
+        for retry in (True, False):
+            conn = self._conn()
+            try:
+                conn.request(method, url_path, body=body)
+                resp = conn.getresponse()
+                resp.read()
+                break
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if not retry:
+                    raise
+        if resp.status >= 300 and not (method == "DELETE" and resp.status == 404):
+            raise OSError(f"{method} {url_path}: {resp.status} {resp.reason}")
+
+    def _after(self, jobs, method, path, body=None):
+        """
+        _after waits for jobs and then sends the request.
+        """
+        wait(jobs)
+        for job in jobs:
+            if job.exception():
+                raise job.exception()
+        self._request(method, path, body)
+
+    def _prune(self, jobs):
+        """
+        _prune returns the jobs not done yet,
+        keeping the first error of those that are.
+        """
+        running = []
+        for job in jobs:
+            if not job.done():
+                running.append(job)
+            elif job.exception() and not self.error:
+                self.error = job.exception()
+        return running
+
+    def _chk_error(self):
+        self.ordered = self._prune(self.ordered)
+        if self.error:
+            error, self.error = self.error, None
+            raise error
+
+    def _in_order(self, method, path, body=None):
+        """
+        _in_order queues a request to go out after
+        every upload queued before it.
+        """
+        jobs, self.pending = self.pending, []
+        self.ordered.append(
+            self.in_order.submit(self._after, jobs, method, path, body)
+        )
+
+    def write(self, path, data, sync=False, atomic=False, append=False):
+        """
+        write uploads data to path.
+        """
+        self._chk_error()
+        if isinstance(data, str):
+            if append:
+                data = self.texts.get(path, "") + data
+            self.texts[path] = data
+            self._in_order("PUT", path, data.encode())
+            return
+        if hasattr(data, "snapshot"):
+            data = data.snapshot()
+        self.pending = self._prune(self.pending)
+        job = self.uploads.submit(self._request, "PUT", path, bytes(data))
+        self.pending.append(job)
+
+    def delete(self, path):
+        """
+        delete removes path from the origin,
+        after the uploads queued before it.
+        """
+        self._in_order("DELETE", path)
+
+    def ready(self, path):
+        """
+        ready waits for the queued uploads.
+        """
+        wait(self.pending + self.ordered)
+        self.pending = self._prune(self.pending)
+        self._chk_error()
+
+    def close(self):
+        """
+        close waits for the queued uploads
+        and closes the connections.
+        """
+        try:
+            self.ready(None)
+        finally:
+            self.uploads.shutdown()
+            self.in_order.shutdown()
+            for conn in self.conns:
+                conn.close()
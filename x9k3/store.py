@@ -0,0 +1,65 @@
+"""
+x9k3
+
+store.py
+
+home of the SegmentStore class.
+"""
+
+import os
+import threading
+
+
+class SegmentStore:
+    """
+    SegmentStore holds segments and m3u8s in memory,
+    by their path relative to root, for an OriginServer.
+
+    Data is kept as bytes and handed out as is,
+    serving it doesn't copy it.
+    Segments are evicted as the SlidingWindow pops them.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.lock = threading.Lock()
+        self.items = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def key(self, path):
+        """
+        key returns the store key for path.
+        """
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, "/")
+
+    def put(self, path, data):
+        """
+        put stores data, bytes, for path.
+        """
+        with self.lock:
+            self.items[self.key(path)] = data
+
+    def append(self, path, data):
+        """
+        append adds data to what is stored for path.
+        """
+        key = self.key(path)
+        with self.lock:
+            self.items[key] = self.items.get(key, b"") + data
+
+    def get(self, key):
+        """
+        get returns the bytes stored for key, or None.
+        """
+        with self.lock:
+            return self.items.get(key)
+
+    def evict(self, path):
+        """
+        evict drops what is stored for path.
+        """
+        with self.lock:
+            self.items.pop(self.key(path), None)
+
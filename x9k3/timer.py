@@ -10,17 +10,34 @@ throttling to simulate live hls from pre-recorded content.
 import time
 from threefive import print2
 
+
 class Timer:
     """
     Timer class instances are used for
     segment duration, and live throttling.
+
+    Times are from time.monotonic,
+    so wall clock steps don't upset throttling.
+
+    throttle keeps an absolute timeline,
+    media_time is the total duration of the
+    segments throttled since start, the time of the
+    first PTS on the timeline. Each segment is held until
+    the clock catches up with media_time, so errors
+    don't add up, and a late segment is made up for
+    by shorter waits after it.
+
+    lead is how far media_time is ahead of the clock,
+    a negative lead is lag.
     """
 
     def __init__(self):
-        self.started = time.time()
+        self.started = time.monotonic()
         self.begin = None
         self.end = None
         self.lap_time = None
+        self.media_time = 0.0
+        self.lead = 0.0
 
     def start(self, begin=None):
         """
@@ -28,9 +45,11 @@ class Timer:
         """
         self.begin = begin
         if not self.begin:
-            self.begin = time.time()
+            self.begin = time.monotonic()
         self.end = None
         self.lap_time = None
+        self.media_time = 0.0
+        self.lead = 0.0
 
     def stop(self, end=None):
         """
@@ -38,7 +57,7 @@ class Timer:
         """
         self.end = end
         if not self.end:
-            self.end = time.time()
+            self.end = time.monotonic()
         self.lap_time = self.end - self.begin
 
     def elapsed(self, now=None):
@@ -46,17 +65,32 @@ class Timer:
         elapsed returns the elapsed time
         """
         if not now:
-            now = time.time()
+            now = time.monotonic()
         return now - self.started
 
+    @staticmethod
+    def _sleep_until(deadline):
+        """
+        _sleep_until sleeps until time.monotonic()
+        reaches deadline.
+        """
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
     def throttle(self, seg_time, begin=None, end=None):
         """
         throttle is called to slow segment creation
         to simulate live streaming.
         """
+        if not self.begin:
+            self.start(begin)
+        self.media_time += seg_time
+        deadline = self.begin + self.media_time
         self.stop(end)
-        diff = round((seg_time - self.lap_time), 2)
-        if diff > 0:
-            print2(f"throttling {diff}")
-            time.sleep(diff)
-        self.start(begin)
+        self.lead = deadline - self.end
+        if self.lead > 0:
+            print2(f"throttling {round(self.lead, 2)}")
+            self._sleep_until(deadline)
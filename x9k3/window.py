@@ -7,42 +7,68 @@ home of the SlidingWindow class.
 """
 
 from collections import deque
-import os
-from pathlib import Path
-from threefive import print2
 
 
 class SlidingWindow:
     """
     The SlidingWindow class
+
+    With delete set, the files of popped panes
+    are added to expired, for the caller to delete
+    once a m3u8 without them is published.
     """
 
     def __init__(self, size=50000):
         self.size = size
         self.panes = deque()
         self.delete = False
+        self.expired = []
+        self.stale = False
+        self._joined = ""
+        self._added = []
+        self._trim = 0
 
     def popleft_pane(self):
         """
         popleft_pane removes the first item in self.panes
         """
         popped = self.panes.popleft()
+        self._trim += len(popped.get())
         if self.delete:
-            Path(popped.name).touch()
-            os.unlink(popped.name)
-            print2(f"deleted {popped.name}")
+            self.expired += [popped.name] + popped.part_names
 
     def push_pane(self, a_pane):
         """
         push appends a_pane to self.panes
         """
         self.panes.append(a_pane)
+        a_pane.window = self
+        self._added.append(a_pane.get())
+
+    def _restitch(self):
+        """
+        _restitch rebuilds the joined panes
+        when a pane has changed since it was pushed.
+        """
+        self._joined = "".join([a_pane.get() for a_pane in self.panes])
+        self._added = []
+        self._trim = 0
+        self.stale = False
 
     def all_panes(self):
         """
         all_panes returns the current window panes joined.
+        Only panes pushed or popped since the last call
+        are added to or trimmed from the joined text.
         """
-        return "".join([a_pane.get() for a_pane in self.panes])
+        if self.stale:
+            self._restitch()
+        elif self._added or self._trim:
+            joined = self._joined + "".join(self._added)
+            self._joined = joined[self._trim :]
+            self._added = []
+            self._trim = 0
+        return self._joined
 
     def slide_panes(self, a_pane=None):
         """
@@ -13,16 +13,31 @@ import os
 import sys
 import time
 from collections import deque
-from operator import itemgetter
+from functools import partial
 
 from new_reader import reader
 from iframes import IFramer
-from threefive import Cue, print2, Segment
+from threefive import print2, Segment
 import threefive.stream as strm
 from m3ufu import M3uFu
 from .argue import argue
+from .bgwriter import BackgroundPublisher
+from .checkpoint import Checkpoint
+from .config import Config
+from .hlspull import HlsPull, _clean_line
+from .llhls import LLHls, PART_PANES
+from .m3u8writer import M3u8Writer
+from .metrics import Metrics, MetricsDumper, MetricsServer
 from .pane import Pane
+from .publish import Publisher
+from .scan import Scanner
+from .scheduler import CueScheduler
 from .scte35 import SCTE35
+from .segbuffer import SegmentBuffer, RangeSegment
+from .server import OriginServer
+from .sidecar import SidecarWatcher
+from .storage import HttpStorage, LocalStorage, MemoryStorage
+from .store import SegmentStore
 from .timer import Timer
 from .window import SlidingWindow
 
@@ -34,6 +49,8 @@ MAINTAINENCE = "00"
 ON = "\033[1m"
 OFF = "\033[0m"
 
+CHUNK_PKTS = 700
+
 
 def version():
     """
@@ -48,27 +65,42 @@ class X9K3(strm.Stream):
     X9K3 class
     """
 
-    def __init__(self, tsdata=None, show_null=False):
+    def __init__(self, tsdata=None, show_null=False, config=None):
         super().__init__(tsdata, show_null)
         self._tsdata = tsdata
         self.in_stream = tsdata
-        self.active_segment = io.BytesIO()
+        self.active_segment = SegmentBuffer()
         self.iframer = IFramer(shush=True)
+        self.scanner = Scanner()
         self.scte35 = SCTE35()
-        self.sidecar = deque()
+        self.sidecar = CueScheduler()
+        self.sidecar_watcher = None
         self.timer = Timer()
+        self.metrics = Metrics()
+        self.throttled = 0.0
         self.m3u8 = "index.m3u8"
+        self.storage = LocalStorage()
+        self.publisher = Publisher(storage=self.storage)
+        self.m3u8_writer = M3u8Writer(self.publisher)
         self.window = SlidingWindow()
+        self.llhls = None
+        self.origin = None
+        self.store = None
+        self.shared_origin = False
+        # the pts the last segment ends at, when the input is cut short
+        self.end_pts = None
+        self.key_pid = None
         self.segnum = 0
-        self.args = argue()
+        self.args = Config()
+        if config is not None:
+            self.args = config.replace()
         self.started = None
         self.next_start = None
         self.media_seq = 0
         self.discontinuity_sequence = 0
         self.first_segment = True
-        self.media_list = deque()
         self.now = None
-        self.last_sidelines = ""
+        self.last_pts = None
         self.started_byte = 0
         self.now_byte = 0
 
@@ -82,6 +114,8 @@ class X9K3(strm.Stream):
         if self._tsdata is not None:
             self.args.input = self._tsdata
         else:
+            if self.args.input is None:
+                self.args.input = sys.stdin.buffer
             self._tsdata = self.args.input
 
     def _args_hls_tag(self):
@@ -95,6 +129,9 @@ class X9K3(strm.Stream):
             raise ValueError(f"{ON}hls tag  must be in {tag_map.keys()}{OFF}")
         self.scte35.tag_method = tag_map[self.args.hls_tag]
 
+    def _args_time(self):
+        self.active_segment.resize(self.args.time)
+
     def _args_output_dir(self):
         if not os.path.isdir(self.args.output_dir):
             os.mkdir(self.args.output_dir)
@@ -118,10 +155,93 @@ class X9K3(strm.Stream):
 
         flags.popleft()  # pop self.args.replay
 
+    def _args_shulga(self):
+        self.scanner.shulga = self.args.shulga
+
     def _args_window_size(self):
         if self.args.live:
             self.window.size = self.args.window_size
 
+    def _args_publish(self):
+        self.publisher.atomic = self.args.atomic
+        self.publisher.set_fsync(self.args.fsync)
+
+    def _args_memory(self):
+        if self.args.memory:
+            if not self.args.http_port or self.is_byterange():
+                print2(f"{ON}memory needs http_port and mpegts segments.{OFF}")
+                return
+            if self.store is None:
+                self.store = SegmentStore(self.args.output_dir)
+            self.storage = MemoryStorage(self.store)
+            self.window.delete = True
+
+    def _args_output_url(self):
+        if self.args.output_url and not self.store:
+            if self.is_byterange():
+                print2(f"{ON}output url needs mpegts segments.{OFF}")
+                return
+            self.storage = HttpStorage(
+                self.args.output_url, self.args.output_dir, workers=self.args.uploads
+            )
+
+    def _args_storage(self):
+        self._args_memory()
+        self._args_output_url()
+        self.publisher.storage = self.storage
+
+    def _args_writer_queue(self):
+        if self.args.writer_queue > 0:
+            self.publisher = BackgroundPublisher(self.publisher, self.args.writer_queue)
+            self.m3u8_writer.publisher = self.publisher
+
+    def _args_copy_range(self):
+        if self.args.copy_range:
+            if self.is_byterange():
+                return
+            if self.is_copy_range() and self.storage.local:
+                self.active_segment = RangeSegment(self.args.input)
+            else:
+                print2(f"{ON}copy range needs a local mpegts file, and a disk.{OFF}")
+
+    def _args_part_time(self):
+        if self.args.part_time > 0:
+            ranged = isinstance(self.active_segment, RangeSegment)
+            if self.args.iframe or self.is_byterange() or ranged:
+                print2(f"{ON}part time needs mpegts segments in memory.{OFF}")
+                return
+            self.llhls = LLHls(self.args.part_time)
+
+    def _args_http_port(self):
+        if self.args.http_port and self.origin is None:
+            hold = 3 * int(self.args.time + 1)
+            self.origin = OriginServer(
+                self.args.output_dir, self.args.http_port, hold=hold, store=self.store
+            )
+            self.origin.start()
+
+    def _args_metrics(self):
+        source = self.args.input
+        if not isinstance(source, str):
+            source = getattr(source, "name", "stdin")
+        self.metrics.labels = {"input": source, "output_dir": self.args.output_dir}
+        if self.args.metrics_port or self.args.metrics_json:
+            self.metrics.register()
+        try:
+            if self.args.metrics_port:
+                MetricsServer.get(self.args.metrics_port)
+        except OSError as err:
+            print2(f"{ON}metrics port {self.args.metrics_port}: {err}{OFF}")
+        if self.args.metrics_json:
+            MetricsDumper.get(self.args.metrics_json, self.args.time)
+
+    def _args_sidecar(self):
+        if self.args.sidecar_file:
+            self.sidecar_watcher = SidecarWatcher(
+                self.args.sidecar_file, remote_interval=self.args.time
+            )
+            self.sidecar_watcher.start()
+
     def _args_continue_m3u8(self):
         if self.args.continue_m3u8:
             self.continue_m3u8()
@@ -134,9 +254,19 @@ class X9K3(strm.Stream):
         self._args_version()
         self._args_input()
         self._args_hls_tag()
+        self._args_time()
         self._args_output_dir()
         self._args_flags()
+        self._args_shulga()
         self._args_window_size()
+        self._args_publish()
+        self._args_storage()
+        self._args_writer_queue()
+        self._args_copy_range()
+        self._args_part_time()
+        self._args_http_port()
+        self._args_metrics()
+        self._args_sidecar()
         self._args_continue_m3u8()
 
         if isinstance(self._tsdata, str):
@@ -193,22 +323,82 @@ class X9K3(strm.Stream):
         os.unlink(tmp_name)
         self.first_segment = True
 
-    def continue_m3u8(self):
+    def checkpoint_state(self):
+        """
+        checkpoint_state returns the state
+        needed to continue the m3u8.
+        """
+        return {
+            "segnum": self.segnum,
+            "media_seq": self.media_seq,
+            "discontinuity_sequence": self.discontinuity_sequence,
+            "panes": [
+                [a_pane.file, a_pane.name, a_pane.num, list(a_pane.tags.items())]
+                for a_pane in self.window.panes
+            ],
+            "cue": self.scte35.get_state(),
+        }
+
+    def _save_checkpoint(self):
+        if self.args.iframe or self.is_byterange() or not self.storage.local:
+            return
+        checkpoint = Checkpoint(self.m3u8uri())
+        self.publisher.call(partial(checkpoint.save, self.checkpoint_state()))
+
+    def _restore_checkpoint(self):
+        """
+        _restore_checkpoint continues the m3u8 from
+        its checkpoint, returns False if there isn't one.
+        Like _reload_m3u8, the last pane
+        gets a discontinuity tag.
+        """
+        state = Checkpoint(self.m3u8uri()).load()
+        if not state:
+            return False
+        self._restore_state(state)
+        return True
+
+    def _restore_state(self, state):
+        """
+        _restore_state continues the m3u8 from state,
+        made by checkpoint_state.
+        """
+        self.media_seq = state["media_seq"]
+        self.discontinuity_sequence = state["discontinuity_sequence"]
+        for file, name, num, tags in state["panes"]:
+            a_pane = Pane(file, name, num)
+            a_pane.tags = dict(tags)
+            self.window.slide_panes(a_pane)
+        if self.window.panes:
+            self.window.panes[-1].add_tag("#EXT-X-DISCONTINUITY", None)
+        self.scte35.set_state(state["cue"])
+        if self.args.live:
+            self.window.slide_panes()
+        self.segnum = state["segnum"] - 1
+        self.first_segment = True
+
+    def continue_m3u8(self, state=None):
         """
         continue_m3u8 reads self.discontinuity_sequence
-        and self.segnum from an existing index.m3u8.
+        and self.segnum from state, the checkpoint_state
+        of the X9K3 before this one, or from the checkpoint
+        of an existing index.m3u8, or from the index.m3u8
+        when there is no checkpoint.
         """
         if self.args.iframe or self.args.byterange:
             print2(
                 f"{ON}Cannot continue m3u8  as 'iframe only' or 'byterange' hls.{OFF}"
             )
             return
-        if os.path.isfile(self.m3u8uri()):
-            self._reload_m3u8()
-            self.segnum += 1
-            print2(
-                f"{ON}Continuing {self.m3u8uri()} @ segment number {self.segnum}{OFF}"
-            )
+        if state is not None:
+            self._restore_state(state)
+        elif os.path.isfile(self.m3u8uri()):
+            if not self._restore_checkpoint():
+                self._reload_m3u8()
+        else:
+            return
+        self.segnum += 1
+        print2(f"{ON}Continuing {self.m3u8uri()} @ segment number {self.segnum}{OFF}")
 
     def m3u8uri(self):
         """
@@ -221,12 +411,7 @@ class X9K3(strm.Stream):
         """
         mk_uri is used to create local filepaths
         """
-        sep = "/"
-        if len(head.split("\\")) > len(head.split("/")):
-            sep = "\\"
-        if not head.endswith(sep):
-            head = head + sep
-        return f"{head}{tail}"
+        return os.path.join(head, tail)
 
     def _header(self):
         """
@@ -241,17 +426,10 @@ class X9K3(strm.Stream):
         bumper = ""
         if self.args.iframe:
             bumper = "#EXT-X-I-FRAMES-ONLY\n" + bumper
-        return "\n".join(
-            [
-                m3u,
-                m3u_version,
-                target,
-                seq,
-                dseq,
-                x9k3v,
-                bumper,
-            ]
-        )
+        lines = [m3u, m3u_version, target]
+        if self.llhls:
+            lines += self.llhls.header(can_block=bool(self.origin))
+        return "\n".join(lines + [seq, dseq, x9k3v, bumper])
 
     def _add_discontinuity(self, a_pane):
         """
@@ -280,17 +458,51 @@ class X9K3(strm.Stream):
             a_pane.add_tag(kay, vee)
             print2(f"{kay} = {vee}")
 
+    def _chk_break(self, seg_time):
+        """
+        _chk_break adds seg_time to the break timer
+        and moves the cue state on after a segment.
+        """
+        if self.scte35.break_timer is not None:
+            self.scte35.break_timer += seg_time
+        self.scte35.chk_cue_state()
+
+    def carry_cue(self, a_pane, seg_time):
+        """
+        carry_cue tags a_pane, a segment seg_time long
+        made by another X9K3, with the cue state
+        of self.scte35, as if this X9K3 had cut it,
+        and moves the cue state on.
+        """
+        self._args_hls_tag()
+        self._add_cue_tag(a_pane)
+        self._chk_break(seg_time)
+
     def _chk_pdt_flag(self, a_pane):
         if self.args.program_date_time:
             a_pane.add_tag("#Iframe", f" @ {self.started}")
             iso8601 = f"{datetime.datetime.utcnow().isoformat()}Z"
             a_pane.add_tag("#EXT-X-PROGRAM-DATE-TIME", f"{iso8601}")
 
+    def _throttles(self):
+        return self.args.live and not self.args.no_throttle
+
+    def _throttle(self, seg_time):
+        """
+        _throttle throttles for seg_time, and adds
+        the time spent to self.throttled.
+        """
+        began = time.perf_counter()
+        self.timer.throttle(seg_time)
+        self.throttled += time.perf_counter() - began
+
     def _chk_live(self, seg_time):
         if self.args.live:
             self.window.slide_panes()
-            if not self.args.no_throttle:
-                self.timer.throttle(seg_time)
+            if self._throttles():
+                if self.llhls:
+                    seg_time -= self.llhls.take_throttled()
+                self._throttle(seg_time)
             self._discontinuity_seq_plus_one()
 
     def _mk_a_pane_tags(self, a_pane, seg_time):
@@ -316,11 +528,19 @@ class X9K3(strm.Stream):
             if self.args.replay or self.args.continue_m3u8:
                 self._add_discontinuity(a_pane)
         self._mk_a_pane_tags(a_pane, seg_time)
+        if self.llhls:
+            a_pane.add_parts(self.llhls.parts, self.llhls.names)
+            self.llhls.reset(self.now)
         self.window.slide_panes(a_pane)
+        if self.llhls and len(self.window.panes) > PART_PANES:
+            self.window.panes[-PART_PANES - 1].drop_parts()
 
     def _write_segment_file(self, seg_name):
-        with open(seg_name, "wb") as seg:
-            seg.write(self.active_segment.getbuffer())
+        self.publisher.publish_segment(seg_name, self.active_segment)
+        seg_time = self.now - self.started
+        if seg_time > 0:
+            bitrate = len(self.active_segment) * 8 / seg_time
+            self.active_segment.resize(self.args.time, bitrate)
 
     def is_byterange(self):
         """
@@ -330,6 +550,17 @@ class X9K3(strm.Stream):
             return True
         return False
 
+    def is_copy_range(self):
+        """
+        is_copy_range returns True if segments can be
+        copied by byte range from a local mpegts input.
+        """
+        if not isinstance(self.args.input, str):
+            return False
+        if "m3u8" in self.args.input or "playlist" in self.args.input:
+            return False
+        return os.path.isfile(self.args.input)
+
     def _write_segment(self):
         if not self.segnum:
             self.segnum = 0
@@ -342,25 +573,148 @@ class X9K3(strm.Stream):
         if seg_time <= 0:
             return
         if not self.is_byterange():
-            self._write_segment_file(seg_name)
+            if self.llhls:
+                self._write_marked_part()
+                self._write_part()
+            with self.metrics.timed("x9k3_segment_write_seconds"):
+                self._write_segment_file(seg_name)
             if seg_time > self.args.time + 2:
                 print2(f"{ON}Verifying {seg_name} time of {seg_time}{OFF}")
-                s = Segment(seg_name)
-                s.decode()
-                if s.duration:
-                    seg_time = s.duration
-                    print2(f"{ON}Setting {seg_name} time to {seg_time}{OFF}")
+                seg_time = self._verify_seg_time(seg_name, seg_time)
         self._mk_a_pane(seg_file, seg_name, seg_time)
         self._write_m3u8()
         self._print_segment_details(seg_name, seg_time)
         #   self._reset_stream()
-        if self.scte35.break_timer is not None:
-            self.scte35.break_timer += seg_time
-        self.scte35.chk_cue_state()
+        self._chk_break(seg_time)
         self._chk_live(seg_time)
+        self._segment_metrics(seg_time)
         self._start_next_start(pts=self.now)
         self.started_byte = self.now_byte
 
+    def _write_part(self, end=None, pts=None):
+        """
+        _write_part writes the bytes of the active segment
+        since the last part, up to byte end at pts,
+        as an EXT-X-PART part.
+        """
+        if end is None:
+            end, pts = len(self.active_segment), self.now
+        if end <= self.llhls.offset:
+            return
+        part_file = self.llhls.part_file(self.segnum, len(self.llhls.parts))
+        part_name = self.mk_uri(self.args.output_dir, part_file)
+        data = self.active_segment.getbuffer()[self.llhls.offset : end]
+        self.publisher.publish_segment(part_name, data, sync=False)
+        duration = pts - self.llhls.started
+        self.llhls.add_part(part_file, part_name, duration, end, pts)
+
+    def _write_marked_part(self):
+        """
+        _write_marked_part writes the part ending at the
+        last PUSI packet within part_time, when a part
+        ending now would be too long. Returns the
+        independent flag for the next part, or None.
+        """
+        mark = self.llhls.mark
+        if not mark or not self.llhls.due(self.now):
+            return None
+        end, pts, independent = mark
+        self._write_part(end, pts)
+        return independent
+
+    def _chk_part(self, i_pts):
+        """
+        _chk_part cuts a part when one is due,
+        at the last PUSI packet within part_time,
+        and publishes the m3u8 with it.
+        A part starting on a key frame is independent.
+        In live mode, parts are throttled, not just segments.
+        """
+        if self.llhls.started is None:
+            self.llhls.reset(self.started)
+        if self.llhls.due(self.now):
+            started = self.llhls.started
+            independent = self._write_marked_part()
+            if independent is None:
+                self._write_part()
+                independent = bool(i_pts)
+            self.llhls.independent = independent
+            duration = self.llhls.started - started
+            tail = self.llhls.tail(self.segnum)
+            with self.metrics.timed("x9k3_m3u8_write_seconds"):
+                self.m3u8_writer.write(
+                    self.m3u8uri(), self._header(), self.window, tail
+                )
+            self._update_origin(len(self.llhls.parts))
+            if self._throttles():
+                self._throttle(duration)
+                self.llhls.throttled += duration
+        self.llhls.chk_mark(len(self.active_segment), self.now, bool(i_pts))
+
+    def _update_origin(self, parts=0):
+        """
+        _update_origin tells the origin server
+        the m3u8 has been written.
+        """
+        if self.origin:
+            self.publisher.ready(self.m3u8uri())
+            self.origin.update(self.segnum, parts)
+
+    def _segment_metrics(self, seg_time):
+        """
+        _segment_metrics updates the metrics
+        set once a segment.
+        """
+        metrics = self.metrics
+        metrics.inc("x9k3_segments_total")
+        deviation = round(seg_time - self.args.time, 6)
+        metrics.set("x9k3_segment_deviation_seconds", deviation)
+        metrics.set("x9k3_sidecar_backlog", len(self.sidecar))
+        if self._throttles():
+            metrics.set("x9k3_throttle_lead_seconds", round(self.timer.lead, 6))
+        if hasattr(self.publisher, "depth"):
+            metrics.set("x9k3_writer_queue_depth", self.publisher.depth)
+        metrics.set_rates(
+            {
+                "x9k3_packets_per_second": "x9k3_packets_total",
+                "x9k3_bytes_per_second": "x9k3_bytes_total",
+                "x9k3_iframes_per_second": "x9k3_iframes_total",
+            }
+        )
+
+    def _decode_seg_time(self, seg_name):
+        """
+        _decode_seg_time re-reads the segment file
+        to get its duration. Without local storage,
+        the segment is read from the active segment.
+        """
+        if self.storage.local:
+            self.publisher.ready(seg_name)
+            s = Segment(seg_name)
+        else:
+            s = Segment(io.BytesIO(self.active_segment.getbuffer()))
+        s.decode()
+        return s.duration
+
+    def _verify_seg_time(self, seg_name, seg_time):
+        """
+        _verify_seg_time returns the segment duration,
+        the last PTS parsed in the segment minus the first,
+        the segment file isn't read again.
+        With verify_time set, a duration outside of
+        (0, seg_time] is checked by re-reading the segment.
+        """
+        duration = None
+        if self.last_pts is not None:
+            duration = round(self.last_pts - self.started, 6)
+        if self.args.verify_time and not (duration and 0 < duration <= seg_time):
+            print2(f"{ON}Re-reading {seg_name}{OFF}")
+            duration = self._decode_seg_time(seg_name)
+        if duration and duration > 0:
+            seg_time = duration
+            print2(f"{ON}Setting {seg_name} time to {seg_time}{OFF}")
+        return seg_time
+
     def _clear_endlist(self, lines):
         return [line for line in lines if not self._endlist(line)]
 
@@ -369,8 +723,7 @@ class X9K3(strm.Stream):
         """
         clobber_file  blanks the_file
         """
-        with open(the_file, "w", encoding="utf8") as clobbered:
-            clobbered.close()
+        LocalStorage().write(the_file, "")
 
     @staticmethod
     def _endlist(line):
@@ -381,62 +734,62 @@ class X9K3(strm.Stream):
     def _write_m3u8(self):
         self.media_seq = self.window.panes[0].num
         self._discontinuity_seq_plus_one()
-        with open(self.m3u8uri(), "w+", encoding="utf8") as m3u8:
-            m3u8.write(self._header())
-            m3u8.write(self.window.all_panes())
-            self.segnum += 1
-            self.first_segment = False
-        self.active_segment = io.BytesIO()
+        tail = ""
+        if self.llhls:
+            tail = self.llhls.tail(self.segnum + 1)
+        with self.metrics.timed("x9k3_m3u8_write_seconds"):
+            self.m3u8_writer.write(self.m3u8uri(), self._header(), self.window, tail)
+        self._delete_expired()
+        self.segnum += 1
+        self._update_origin()
+        self.first_segment = False
+        self.active_segment.reset()
         self.window.slide_panes()
+        if self.args.live:
+            self._save_checkpoint()
+
+    def _delete_expired(self):
+        """
+        _delete_expired deletes the segments
+        that have slid out of the window.
+        """
+        for name in self.window.expired:
+            self.publisher.delete(name)
+        self.window.expired = []
 
     def load_sidecar(self):
         """
-        load_sidecar reads (pts, cue) pairs from
-        the sidecar file and loads them into X9K3.sidecar
+        load_sidecar takes the (pts, cue) pairs read
+        by self.sidecar_watcher and loads them into X9K3.sidecar
         """
-        if self.args.sidecar_file:
-            with reader(self.args.sidecar_file) as sidefile:
-                sidelines = sidefile.readlines()
-                if sidelines == self.last_sidelines:
-                    return
-                for line in sidelines:
-                    line = line.decode().strip().split("#", 1)[0]
-                    if line:
-                        print2(f"{ON}loading  {line}{OFF}")
-                        if float(line.split(",", 1)[0]) == 0.0:
-                            line = f'{self.now},{line.split(",",1)[1]}'
-                        self.add2sidecar(line)
-                sidefile.close()
-                self.last_sidelines = sidelines
-            self.clobber_file(self.args.sidecar_file)
+        if self.sidecar_watcher:
+            for line in self.sidecar_watcher.lines():
+                print2(f"{ON}loading  {line}{OFF}")
+                if float(line.split(",", 1)[0]) == 0.0:
+                    line = f'{self.now},{line.split(",",1)[1]}'
+                self.add2sidecar(line)
 
     def add2sidecar(self, line):
         """
-        add2sidecar add insert_pts,cue to the deque
+        add2sidecar add insert_pts,cue to the scheduler
         """
         insert_pts, cue = line.split(",", 1)
-        insert_pts = float(insert_pts)
-        if [insert_pts, cue] not in self.sidecar:
-            self.sidecar.append([insert_pts, cue])
-            self.sidecar = deque(sorted(self.sidecar, key=itemgetter(0)))
+        self.sidecar.add(float(insert_pts), cue)
 
     def _chk_sidecar_cues(self, pid):
         """
         _chk_sidecar_cues checks the insert pts time
         for the next sidecar cue and inserts the cue if needed.
         """
-        if self.sidecar:
-            for s in list(self.sidecar):
-                splice_pts = float(s[0])
-                splice_cue = s[1]
-                if self.started:
-                    if self.started <= splice_pts <= self.now:
-                        self.sidecar.remove(s)
-                        self.scte35.cue = Cue(splice_cue)
-                        self.scte35.cue.decode()
-                        self.scte35.cue.show()
-                        self._chk_cue_time(pid)
-                        self._chk_splice_point()
+        while self.sidecar and self.started:
+            due = self.sidecar.pop_due(self.started, self.now)
+            if not due:
+                return
+            splice_cue = due[1]
+            self.scte35.cue = self.scte35.cue_cache.decode(splice_cue)
+            self.scte35.cue.show()
+            self._chk_cue_time(pid)
+            self._chk_splice_point()
 
     def _discontinuity_seq_plus_one(self):
         if self.window.panes:
@@ -453,13 +806,16 @@ class X9K3(strm.Stream):
     def _start_next_start(self, pts=None):
         """
         _start_next_start sets when the current
-        segment starts and ends.
+        segment starts and ends. The throttle timeline
+        starts with the first segment.
         """
         rollover = self.ROLLOVER / 90000.0
         if pts is not None:
             self.started = pts
         else:
             self.started = self.next_start
+        if self.timer.begin is None:
+            self.timer.start()
         self.next_start = self.started + self.args.time
         if self.next_start + self.args.time > rollover:
             self._reset_stream()
@@ -506,64 +862,186 @@ class X9K3(strm.Stream):
         if self._rai_flag(pkt):
             self._chk_splice_point()
 
+    def _find_start(self):
+        """
+        _find_start overrides the inherited method
+        to set where copy range segments start.
+        """
+        found = super()._find_start()
+        if found and isinstance(self.active_segment, RangeSegment):
+            self.active_segment.start = self._tsdata.tell() - self.PACKET_SIZE
+        return found
+
     def _parse_scte35(self, pkt, pid):
         """
         _parse_scte35 overrides the inherited method.
         """
         cue = super()._parse_scte35(pkt, pid)
         if cue:
-            cue.decode()
             self.scte35.cue = cue
             self._chk_cue_time(pid)
-            self.add2sidecar(f"{self._adjusted_pts(cue, pid)}, {cue.encode()}")
+            b64 = self.scte35.cue_cache.add(cue)
+            self.add2sidecar(f"{self._adjusted_pts(cue, pid)}, {b64}")
         return cue
 
     def _chk_iframe(self, pkt, pkt_pid):
         i_pts = self.iframer.parse(pkt)
         if i_pts:
+            self.metrics.inc("x9k3_iframes_total")
+            self.key_pid = pkt_pid
             self.now = i_pts
             if self.args.iframe:
                 self.next_start = i_pts
             self.load_sidecar()
             self._chk_sidecar_cues(pkt_pid)
             self._chk_splice_point()
+        return i_pts
 
     def _parse(self, pkt):
         """
         _parse is run on every packet.
         """
-        super()._parse(pkt)
         self.now_byte += 188
+        self._parse_decision(pkt)
+        if not self.is_byterange():
+            self.active_segment.write(pkt)
+
+    def _scanner_pids(self):
+        self.scanner.set_pids(self.pids.tables | self.pids.scte35)
+        return self.scanner.pids
+
+    def _skip_pusi(self):
+        """
+        _skip_pusi returns True when PUSI packets that
+        aren't key frames can be skipped. That needs a
+        start time and a single program, and not
+        low latency hls, parts are cut at PUSI packets.
+        """
+        if self.llhls:
+            return False
+        return bool(self.started) and len(self.maps.prgm) <= 1
+
+    def _parse_chunk(self, chunk):
+        """
+        _parse_chunk parses a chunk of packets.
+        Only packets found by self.scanner are parsed,
+        the packets between them are written
+        to the active segment in bulk.
+        Once started, PUSI packets that aren't
+        key frames are skipped, except the last one
+        before each parsed packet.
+        """
+        began = time.perf_counter() - self.throttled
+        copy = not self.is_byterange()
+        view = memoryview(chunk)
+        base = self.now_byte
+        start = 0
+        scan_pids = self._scanner_pids()
+        skip_pusi = self._skip_pusi()
+        offsets = deque(self.scanner.offsets(chunk, 0, skip_pusi))
+        while offsets:
+            idx = offsets.popleft()
+            if copy and idx > start:
+                self.active_segment.write(view[start:idx])
+            start = idx
+            self.now_byte = base + idx + self.PACKET_SIZE
+            self._parse_decision(chunk[idx : idx + self.PACKET_SIZE])
+            if self._scanner_pids() != scan_pids:
+                scan_pids = self.scanner.pids
+                offsets = deque(
+                    self.scanner.offsets(chunk, idx + self.PACKET_SIZE, skip_pusi)
+                )
+        tail = len(chunk) - len(chunk) % self.PACKET_SIZE
+        if copy and tail > start:
+            self.active_segment.write(view[start:tail])
+        self.now_byte = base + tail
+        if tail < len(chunk):
+            self._parse(chunk[tail:])
+        self.metrics.inc("x9k3_packets_total", len(chunk) // self.PACKET_SIZE)
+        self.metrics.inc("x9k3_bytes_total", len(chunk))
+        parse_time = time.perf_counter() - self.throttled - began
+        self.metrics.observe("x9k3_parse_seconds", parse_time)
+
+    def _parse_decision(self, pkt):
+        """
+        _parse_decision parses pkt and checks
+        if a segment should be cut.
+        """
+        super()._parse(pkt)
         pkt_pid = self._parse_pid(pkt[1], pkt[2])
+        self.last_pts = self.now
         self.now = self.pid2pts(pkt_pid)
         if not self.started:
             self._start_next_start(pts=self.now)
         if self._pusi_flag(pkt) and self.started:
+            i_pts = None
             if self.args.shulga:
                 self._shulga_mode(pkt)
             else:
-                self._chk_iframe(pkt, pkt_pid)
-        if not self.is_byterange():
-            self.active_segment.write(pkt)
+                i_pts = self._chk_iframe(pkt, pkt_pid)
+            if self.llhls and self.started:
+                self._chk_part(i_pts)
 
     def _last_buff(self):
         """
         _last_buff writes antthing left in the
         active_segment buffer for the last segment.
         """
-        buff = self.active_segment.getbuffer()
-        if buff:
-            self._write_segment()
+        if len(self.active_segment):
+            if self.end_pts is not None:
+                self._end_cut()
+            else:
+                self.last_pts = self.now
+                self._write_segment()
             time.sleep(0.5)
 
+    def _end_cut(self):
+        """
+        _end_cut cuts the last segment at end_pts,
+        the key frame the input was cut short at,
+        checking sidecar cues there like _chk_iframe.
+        """
+        self.last_pts = self.now
+        self.now = self.end_pts
+        self.next_start = self.now
+        if self.key_pid is not None:
+            self._chk_sidecar_cues(self.key_pid)
+        if len(self.active_segment):
+            self._chk_splice_point()
+
     def addendum(self):
         """
         addendum post stream parsing related tasks.
         """
         self._last_buff()
+        if self.sidecar_watcher:
+            self.sidecar_watcher.stop()
         if not self.args.live:
-            with open(self.m3u8uri(), "a", encoding="utf8") as m3u8:
-                m3u8.write("#EXT-X-ENDLIST")
+            self.m3u8_writer.endlist(self.m3u8uri())
+        self._delete_expired()
+        self._save_checkpoint()
+        self.publisher.close()
+        self.active_segment.close()
+        if self.origin and not self.shared_origin:
+            self.origin.stop()
+        if self.args.metrics_json:
+            MetricsDumper.get(self.args.metrics_json).dump()
+        self.metrics.unregister()
+
+    def publish_panes(self, panes):
+        """
+        publish_panes writes a vod index.m3u8
+        of panes, that have already been segmented.
+        """
+        self._args_publish()
+        for a_pane in panes:
+            self.window.slide_panes(a_pane)
+        self.m3u8_writer.write(self.m3u8uri(), self._header(), self.window)
+        self.m3u8_writer.endlist(self.m3u8uri())
+        if panes:
+            self.segnum = panes[-1].num + 1
+        self._save_checkpoint()
+        self.publisher.close()
 
     def decode(self, func=False):
         """
@@ -571,79 +1049,60 @@ class X9K3(strm.Stream):
         and starts parsing.
         """
         self.apply_args()
-        _ = {print(k, "=", v) for k, v in vars(self.args).items()}
-        self.timer.start()
-        if isinstance(self.args.input, str) and ("m3u8" in self.args.input):
+        _ = {print(k, "=", v) for k, v in self.args.items()}
+        if self.args.aio:
+            from .aio import Pipeline
+
+            Pipeline(self).run()
+            return
+        if self.is_m3u8():
             self.decode_m3u8(self.args.input)
         else:
-            super().decode()
+            self.decode_chunks()
         self.addendum()
 
-    def _parse_m3u8_media(self, media):
+    def is_m3u8(self):
+        """
+        is_m3u8 returns True if the input is a m3u8.
+        """
+        return isinstance(self.args.input, str) and ("m3u8" in self.args.input)
+
+    def decode_chunks(self):
         """
-        _parse_m3u8_media parse a segment from
-        a m3u8 input file if it has not been parsed.
+        decode_chunks reads the input
+        CHUNK_PKTS packets at a time.
         """
-        max_media = 10101
-        if media not in self.media_list:
-            self.media_list.append(media)
-            while len(self.media_list) > max_media:
-                self.media_list.popleft()
-            self._tsdata = reader(media)
-            for pkt in self.iter_pkts():
-                self._parse(pkt)
-            self._tsdata.close()
+        if self._find_start():
+            for chunk in self.iter_pkts(num_pkts=CHUNK_PKTS):
+                self._parse_chunk(chunk)
+
+    def _parse_m3u8_media(self, media, data):
+        """
+        _parse_m3u8_media parses data,
+        a segment from a m3u8 input file.
+        """
+        size = self.PACKET_SIZE * CHUNK_PKTS
+        for start in range(0, len(data), size):
+            self._parse_chunk(data[start : start + size])
 
     def decode_m3u8(self, manifest=None):
         """
         decode_m3u8 is called when the input file is a m3u8 playlist.
+        Segments are pulled by an HlsPull.
         """
-        based = manifest.rsplit("/", 1)
-        if len(based) > 1:
-            base_uri = f"{based[0]}/"
-        else:
-            base_uri = ""
-        while True:
-            with reader(manifest) as manifesto:
-                m3u8 = manifesto.readlines()
-                for line in m3u8:
-                    if not line:
-                        break
-                    line = _clean_line(line)
-                    if self._endlist(line):
-                        return False
-                    if line.startswith("#"):
-                        media = None
-                    else:
-                        media = line
-                        if base_uri not in media:
-                            media = base_uri + media
-                        self._parse_m3u8_media(media)
-
-
-def _clean_line(line):
-    if isinstance(line, bytes):
-        line = line.decode(errors="ignore")
-    line = line.replace("\n", "").replace("\r", "")
-    return line
-
-
-def decode_playlist(playlist):
-    """
-    decode_playlist parses a playlist file
-    and segments all the media into 1 stream.
-    A playlist file is a list of media OR media,sidecar lines
-    Example:
+        for media, data in HlsPull(manifest):
+            self._parse_m3u8_media(media, data)
 
-    /home/a/video.ts
-    /home/a/othervideo.ts,/home/a/other_sidecar.txt
-    https://futzu.com/xaa.ts
 
+def _playlist_entries(playlist):
+    """
+    _playlist_entries returns a list of (media, sidecar)
+    pairs from a playlist, sidecar is None
+    when a line doesn't have one.
     """
     comma = ","
     octothorpe = "#"
-    sidecar = None
-    first = True
+    entries = []
     with reader(playlist) as plist:
         for line in plist.readlines():
             if not line:
@@ -651,36 +1110,137 @@ def decode_playlist(playlist):
             line = _clean_line(line)
             media = line.split(octothorpe)[0]
             if media:
+                sidecar = None
                 if comma in media:
                     media, sidecar = media.split(comma)
-                print2(f"{ON}loading media {media}{OFF}")
-                x9 = X9K3()
-                if sidecar:
-                    print2(f"{ON}loading sidecar file {sidecar}{OFF}")
-                    x9.args.sidecar_file = sidecar
-                x9.args.input = media
-                if first:
-                    x9.decode()
-                    first = False
-                else:
-                    x9.continue_m3u8()
-                    x9.decode()
+                entries.append((media, sidecar))
+    return entries
+
+
+def _parallel_vod(config):
+    """
+    _parallel_vod returns True if config.parallel is set
+    and config is for vod to a local output_dir.
+    """
+    if config.parallel < 2:
+        return False
+    live = (config.live, config.replay, config.delete, config.program_date_time)
+    remote = config.output_url or config.memory
+    if True in live or config.byterange or remote:
+        print2(f"{ON}parallel is vod to a local output_dir only.{OFF}")
+        return False
+    return True
+
+
+def decode_playlist(playlist, config=None):
+    """
+    decode_playlist parses a playlist file
+    and segments all the media into 1 stream,
+    using config, (a Config), for the settings.
+    A playlist file is a list of media OR media,sidecar lines
+    Example:
+
+    /home/a/video.ts
+    /home/a/othervideo.ts,/home/a/other_sidecar.txt
+    https://futzu.com/xaa.ts
+
+    With config.parallel set for vod to a local output_dir,
+    entries are segmented at the same time by decode_playlist_parallel.
+    """
+    if config is None:
+        config = Config()
+    entries = _playlist_entries(playlist)
+    if _parallel_vod(config):
+        from .playlist import decode_playlist_parallel
+
+        decode_playlist_parallel(entries, config)
+        return
+    sidecar = None
+    x9 = None
+    for idx, (media, line_sidecar) in enumerate(entries):
+        sidecar = line_sidecar or sidecar
+        print2(f"{ON}loading media {media}{OFF}")
+        if x9 is None:
+            x9 = X9K3(config=config)
+        else:
+            x9 = _carry_on(x9, config)
+        x9.shared_origin = idx < len(entries) - 1
+        if sidecar:
+            print2(f"{ON}loading sidecar file {sidecar}{OFF}")
+            x9.args.sidecar_file = sidecar
+        x9.args.input = media
+        x9.decode()
+
+
+def _carry_on(last, config):
+    """
+    _carry_on returns a new X9K3 that continues
+    the m3u8 where last stopped, with the
+    SegmentStore and OriginServer of last.
+    """
+    x9 = X9K3(config=config)
+    x9.store = last.store
+    x9.origin = last.origin
+    x9.continue_m3u8(last.checkpoint_state())
+    return x9
 
 
 def cli():
     """
     cli provides one function call for running X9K3.
     """
-    args = argue()
-    if isinstance(args.input, str) and ("playlist" in args.input):
-        decode_playlist(args.input)
+    args = Config.from_args(argue())
+    if args.channels:
+        from .channels import load_channels, run_channels
+
+        if run_channels(load_channels(args.channels)):
+            sys.exit(1)
     else:
-        x9 = X9K3()
+        run(args)
+
+
+def _parallel_file(config):
+    """
+    _parallel_file returns True if config.input
+    is a local mpegts file to segment with decode_parallel.
+    """
+    media = config.input
+    if not isinstance(media, str) or not os.path.isfile(media):
+        return False
+    if media.endswith(".m3u8") or config.iframe:
+        return False
+    return _parallel_vod(config)
+
+
+def run(config):
+    """
+    run segments config.renditions with an AbrLadder,
+    or config.input, a playlist with decode_playlist,
+    a vod file with decode_parallel when config.parallel is set,
+    otherwise with X9K3,
+    again and again when config.replay is set,
+    each replay continuing where the last one stopped.
+    """
+    if config.renditions:
+        from .abr import AbrLadder
+
+        AbrLadder(config.renditions, config).decode()
+        return
+    if isinstance(config.input, str) and ("playlist" in config.input):
+        decode_playlist(config.input, config)
+        return
+    if _parallel_file(config):
+        from .parallel import decode_parallel
+
+        if decode_parallel(config):
+            return
+    x9 = X9K3(config=config)
+    x9.shared_origin = config.replay
+    x9.decode()
+    while config.replay:
+        x9 = _carry_on(x9, config)
+        x9.shared_origin = True
         x9.decode()
-        while args.replay:
-            x9 = X9K3()
-            x9.continue_m3u8()
-            x9.decode()
 
 
 if __name__ == "__main__":